@@ -1,3 +1,22 @@
 from django.contrib import admin
+from django.utils.translation import ugettext_lazy as _
 
-# Register your models here.
+from .models import SpacesCalendar
+
+class SpacesCalendarAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'space', 'is_published', 'public_token')
+    list_filter = ('is_published',)
+    readonly_fields = ('public_token',)
+    actions = ['publish', 'unpublish']
+
+    def publish(self, request, queryset):
+        for calendar in queryset:
+            calendar.publish()
+    publish.short_description = _('Publish selected calendars')
+
+    def unpublish(self, request, queryset):
+        for calendar in queryset:
+            calendar.unpublish()
+    unpublish.short_description = _('Unpublish selected calendars')
+
+admin.site.register(SpacesCalendar, SpacesCalendarAdmin)
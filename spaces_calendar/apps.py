@@ -1,8 +1,8 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete
 from collab.util import db_table_exists
 
-from spaces_calendar.signals import create_notice_types
+from spaces_calendar.signals import create_notice_types, event_type_changed
 
 #TODO: Put into settings.py
 EVENT_TYPES = (
@@ -27,6 +27,10 @@ def create_event_types(type_list = EVENT_TYPES):
 class SpacesCalendarConfig(AppConfig):
     name = 'spaces_calendar'
     def ready(self):
+        # keep the cached event types in sync with the database
+        from swingtime.models import EventType
+        post_save.connect(event_type_changed, sender=EventType)
+        post_delete.connect(event_type_changed, sender=EventType)
         create_event_types()
         # activate activity streams for CalendarEvent
         from actstream import registry
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from swingtime.models import Event, Note, Occurrence
+
+from .models import ArchivedEvent, ArchivedOccurrence, CalendarEvent
+
+def archive_horizon():
+    """
+    Returns the datetime before which events get archived. Configurable in
+    days with the SPACES_CALENDAR_ARCHIVE_DAYS setting, defaults to two years.
+    """
+    days = getattr(settings, 'SPACES_CALENDAR_ARCHIVE_DAYS', 730)
+    return timezone.now() - timedelta(days=days)
+
+def archivable_event_ids(before, event_ids=None):
+    """
+    Ids of all calendar events whose occurrences all ended before ``before``,
+    optionally only out of ``event_ids``.
+    """
+    events = Event.objects.all()
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+    return list(
+        events
+            .filter(calendarevent__isnull=False)
+            .annotate(last_end=Max('occurrence__end_time'))
+            .filter(last_end__lt=before)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+    )
+
+def archive_events(event_ids, before=None):
+    """
+    Copies the given events, their occurrences and description notes into
+    the archive tables and deletes the originals, all in one transaction.
+    Returns the number of archived events.
+
+    With ``before``, the events and their occurrences get locked first and
+    only those still ending before ``before`` are archived. Events edited
+    since the ids were collected, e.g. shifted into the future, stay live.
+    """
+    event_type = ContentType.objects.get_for_model(Event)
+    with transaction.atomic():
+        if before is not None:
+            # FOR UPDATE is not allowed together with the aggregate, lock
+            # first and filter afterwards.
+            list(
+                Event.objects
+                    .select_for_update()
+                    .filter(pk__in=event_ids)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+            )
+            list(
+                Occurrence.objects
+                    .select_for_update()
+                    .filter(event__pk__in=event_ids)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+            )
+            event_ids = archivable_event_ids(before, event_ids)
+        calendar_events = list(
+            CalendarEvent.objects
+                .filter(event__pk__in=event_ids)
+                .select_related('event')
+                .prefetch_related('event__occurrence_set')
+        )
+        notes = dict(
+            Note.objects
+                .filter(content_type=event_type, object_id__in=event_ids)
+                .values_list('object_id', 'note')
+        )
+        archived_events = []
+        archived_occurrences = []
+        for calendar_event in calendar_events:
+            event = calendar_event.event
+            archived_events.append(ArchivedEvent(
+                id=event.pk,
+                calendar_id=calendar_event.calendar_id,
+                author_id=calendar_event.author_id,
+                event_type_id=event.event_type_id,
+                title=event.title,
+                description=notes.get(event.pk, event.description),
+            ))
+            for occurrence in event.occurrence_set.all():
+                archived_occurrences.append(ArchivedOccurrence(
+                    event_id=event.pk,
+                    start_time=occurrence.start_time,
+                    end_time=occurrence.end_time,
+                ))
+        ArchivedEvent.objects.bulk_create(archived_events)
+        ArchivedOccurrence.objects.bulk_create(archived_occurrences)
+        # cascades to occurrences, calendar events and notes
+        Event.objects.filter(pk__in=[e.id for e in archived_events]).delete()
+    return len(archived_events)
+
+def archive_before(before=None, batch_size=500):
+    """
+    Archives all calendar events that ended before ``before`` (defaults to
+    archive_horizon()) in batches of ``batch_size`` events. Meant to be
+    called from the archive_calendar command or a periodic task.
+    Returns the number of archived events.
+    """
+    if before is None:
+        before = archive_horizon()
+    event_ids = archivable_event_ids(before)
+    archived = 0
+    for i in range(0, len(event_ids), batch_size):
+        archived += archive_events(event_ids[i:i+batch_size], before)
+    return archived
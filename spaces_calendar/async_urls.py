@@ -0,0 +1,37 @@
+"""
+URLs for ASGI deployments: the same URLs and names as
+spaces_calendar.urls, with the read views replaced by their async versions.
+Async views need Django 3.1 or later.
+"""
+import copy
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+if django.VERSION < (3, 1):
+    raise ImproperlyConfigured('spaces_calendar.async_urls requires Django 3.1 or later.')
+
+from . import async_views
+from .urls import app_name, urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'index': async_views.index,
+    'yearly_view': async_views.year_view,
+    'monthly_view': async_views.month_view,
+    'quarterly_view': async_views.quarterly_view,
+    'prefetch_quarter': async_views.prefetch_quarter,
+    'daily_view': async_views.day_view,
+    'event': async_views.event_view,
+    'public_month': async_views.public_month_view,
+    'public_month_json': async_views.public_month_view,
+}
+
+def async_pattern(pattern):
+    view = ASYNC_VIEWS.get(pattern.name)
+    if view is None:
+        return pattern
+    pattern = copy.copy(pattern)
+    pattern.callback = view
+    return pattern
+
+urlpatterns = tuple(async_pattern(pattern) for pattern in sync_urlpatterns)
@@ -0,0 +1,281 @@
+"""
+Async versions of the read-only calendar views for ASGI deployments, which
+need Django 3.1 or later. Include spaces_calendar.async_urls instead of
+spaces_calendar.urls to use them; the write views are shared with the sync
+URLs.
+
+The Django versions this app supports have no async ORM interface yet, so
+database work runs in worker threads via database_sync_to_async. Queries
+that don't depend on each other are awaited together and run concurrently.
+Everything touching the session, the user or templates runs through the
+thread sensitive sync_to_async, like Django does for sync views.
+"""
+import asyncio
+import functools
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django import http
+from django.db import close_old_connections
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import quote_etag
+
+from swingtime.models import Event, Occurrence
+from spaces_notifications.forms import NotificationFormSet
+
+from collab.decorators import permission_required_or_403
+from .cache import calendar_cache, get_event_types, quarter_cache_key
+from .decorators import calendar_etag
+from .models import ArchivedOccurrence
+from .occurrences import occurrence_items
+from . import forms, views
+
+def sync(func):
+    """
+    sync_to_async in the thread shared with all other sync code of the
+    request, for everything touching session, user, cache or templates.
+    """
+    return sync_to_async(func, thread_sensitive=True)
+
+def database_sync_to_async(func):
+    """
+    Like sync_to_async, but runs ``func`` in a thread of its own so several
+    calls can run concurrently. As every such thread gets its own database
+    connection, stale connections get closed before and after the call.
+    """
+    def _inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(_inner, thread_sensitive=False)
+
+# The querysets are built inside the worker threads, as filtering by a
+# lazily loaded request.SPACE may hit the database.
+
+def _live_items(space, q):
+    return occurrence_items(views.space_occurrences(space).filter(q))
+
+def _archived_items(space, q):
+    return occurrence_items(
+        ArchivedOccurrence.objects.filter(event__calendar__space=space).filter(q),
+        archived=True
+    )
+
+def _published_items(calendar, q):
+    return occurrence_items(
+        Occurrence.objects.filter(event__calendarevent__calendar=calendar).filter(q)
+    )
+
+def _published_archived_items(calendar, q):
+    return occurrence_items(
+        ArchivedOccurrence.objects.filter(event__calendar=calendar).filter(q),
+        archived=True
+    )
+
+def async_permission_required_or_403(perm):
+    """
+    Async counterpart of collab's permission_required_or_403: runs its check
+    in a sync thread and only calls the wrapped view if it passed.
+    """
+    check = permission_required_or_403(perm)(lambda request, *args, **kwargs: None)
+    def decorator(view):
+        @functools.wraps(view)
+        async def _wrapped(request, *args, **kwargs):
+            denied = await sync(check)(request, *args, **kwargs)
+            if denied is not None:
+                return denied
+            return await view(request, *args, **kwargs)
+        return _wrapped
+    return decorator
+
+def _conditional(etag_func, private=True):
+    """
+    Async counterpart of django's condition decorator, for ETags only.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def _wrapped(request, *args, **kwargs):
+            etag = await sync(etag_func)(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                if etag and not response.has_header('ETag'):
+                    response['ETag'] = etag
+            if private:
+                patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                # also on 304s, they have to repeat the caching headers of
+                # the full response
+                patch_vary_headers(response, ('Accept-Language',))
+                patch_cache_control(response, public=True, max_age=views.PUBLIC_MAX_AGE)
+            return response
+        return _wrapped
+    return decorator
+
+calendar_condition = _conditional(calendar_etag)
+
+@async_permission_required_or_403('access_space')
+@calendar_condition
+async def index(request):
+    '''
+    Async version of views.index.
+    '''
+    now = timezone.now()
+    return await _quarterly_view(request, now.year, int(ceil(now.month/3.)))
+
+@async_permission_required_or_403('access_space')
+@calendar_condition
+async def month_view(request, year, month, template='spaces_calendar/monthly_view.html'):
+    '''
+    Async version of views.month_view.
+    '''
+    year, month = int(year), int(month)
+    occurrences = await database_sync_to_async(_live_items)(
+        request.SPACE, views.month_filter(year, month)
+    )
+    context = views.month_context(year, month, occurrences)
+    return await sync(render)(request, template, context)
+
+async def _quarter_calendars(request, year, quarter):
+    """
+    Async version of views.quarter_calendars. On a cache miss the three
+    months get queried concurrently.
+    """
+    months = views.QUARTER_MONTHS[quarter-1]
+    key = await database_sync_to_async(quarter_cache_key)(request, year, quarter)
+    calendars = await sync(calendar_cache().get)(key)
+    if calendars is None:
+        occurrences = await asyncio.gather(*[
+            database_sync_to_async(_live_items)(request.SPACE, views.month_filter(year, month))
+            for month in months
+        ])
+        calendars = [
+            views.month_grid(year, month, month_occurrences)
+            for month, month_occurrences in zip(months, occurrences)
+        ]
+        await sync(views.store_quarter_calendars)(key, calendars)
+    return calendars
+
+async def _quarterly_view(request, year, quarter, template='spaces_calendar/quarterly_view.html'):
+    year, quarter = int(year), int(quarter)
+    calendars = await _quarter_calendars(request, year, quarter)
+    context = views.quarter_context(year, quarter, calendars)
+    return await sync(render)(request, template, context)
+
+@async_permission_required_or_403('access_space')
+@calendar_condition
+async def quarterly_view(request, year, quarter, template='spaces_calendar/quarterly_view.html'):
+    '''
+    Async version of views.quarterly_view.
+    '''
+    return await _quarterly_view(request, year, quarter, template)
+
+@async_permission_required_or_403('access_space')
+async def prefetch_quarter(request, year, quarter):
+    '''
+    Async version of views.prefetch_quarter.
+    '''
+    await _quarter_calendars(request, int(year), int(quarter))
+    return http.HttpResponse(status=204)
+
+@async_permission_required_or_403('access_space')
+async def year_view(request, year, template='spaces_calendar/yearly_view.html'):
+    '''
+    Async version of views.year_view, live and archived occurrences are
+    queried concurrently.
+    '''
+    year = int(year)
+    live, archived = await asyncio.gather(
+        database_sync_to_async(_live_items)(request.SPACE, views.year_filter(year)),
+        database_sync_to_async(_archived_items)(request.SPACE, views.year_filter(year)),
+    )
+    context = views.year_context(year, live + archived)
+    return await sync(render)(request, template, context)
+
+async def day_view(request, year, month, day, **params):
+    '''
+    The daily view forwards to swingtime's sync implementation.
+    '''
+    return await sync(views.day_view)(request, year, month, day, **params)
+
+async def event_view(request, pk, template='spaces_calendar/event_detail.html'):
+    '''
+    Async version of views.event_view for GET requests: the event and its
+    occurrences are loaded concurrently. Updates are handed to the sync view.
+    '''
+    if request.method != 'GET':
+        return await sync(views.event_view)(request, pk, template)
+    return await _event_detail(request, pk, template)
+
+@async_permission_required_or_403('access_space')
+async def _event_detail(request, pk, template):
+    def load_event():
+        return get_object_or_404(
+            Event.objects.select_related('calendarevent__author', 'event_type'),
+            pk=pk
+        )
+
+    def load_occurrences():
+        occurrences = Occurrence.objects\
+                        .filter(event__pk=pk)\
+                        .order_by('start_time', 'end_time')
+        list(occurrences)
+        return occurrences
+
+    event, occurrences = await asyncio.gather(
+        database_sync_to_async(load_event)(),
+        database_sync_to_async(load_occurrences)(),
+    )
+
+    def render_page():
+        data = {
+            'event': event,
+            'occurrences': occurrences,
+            'event_form': forms.EventForm(instance=event),
+            'occurrence_formset': forms.OccurrenceFormSet(
+                queryset=occurrences,
+                prefix='occurrences'
+            ),
+            'notification_formset': NotificationFormSet(request.SPACE)
+        }
+        return render(request, template, data)
+    return await sync(render_page)()
+
+@_conditional(views.public_etag, private=False)
+async def public_month_view(
+    request,
+    token,
+    year=None,
+    month=None,
+    fmt='html',
+    template='spaces_calendar/public_month.html'
+):
+    '''
+    Async version of views.public_month_view.
+    '''
+    # already loaded and memoized by the ETag computation
+    calendar = await sync(views.published_calendar)(request, token)
+    year, month = views.public_month(year, month)
+    live, archived, event_types = await asyncio.gather(
+        database_sync_to_async(_published_items)(calendar, views.month_filter(year, month)),
+        database_sync_to_async(_published_archived_items)(calendar, views.month_filter(year, month)),
+        database_sync_to_async(get_event_types)(),
+    )
+    if fmt == 'json':
+        response = views.public_month_json(year, month, live + archived, event_types)
+    else:
+        context = views.public_month_context(
+            calendar, token, year, month, live + archived, event_types
+        )
+        response = await sync(render)(request, template, context)
+        response.xframe_options_exempt = True
+    return response
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+EVENT_TYPES_KEY = 'spaces_calendar:event_types'
+
+def calendar_cache():
+    """
+    Returns the cache backend used by the calendar. Defaults to the 'default'
+    cache, can be changed with the SPACES_CALENDAR_CACHE setting.
+    """
+    return caches[getattr(settings, 'SPACES_CALENDAR_CACHE', 'default')]
+
+def get_event_types():
+    """
+    Returns a tuple of all EventType instances, ordered by pk.
+    Event types hardly ever change, so they are kept in the calendar cache.
+    Saving or deleting an EventType clears the entry, but only in the cache
+    of the process doing so. With a per-process cache like LocMemCache other
+    processes pick up the change when the entry expires, after
+    SPACES_CALENDAR_EVENT_TYPES_TIMEOUT seconds (default 5 minutes).
+    """
+    from swingtime.models import EventType
+    cache = calendar_cache()
+    event_types = cache.get(EVENT_TYPES_KEY)
+    if event_types is None:
+        event_types = tuple(EventType.objects.order_by('pk'))
+        cache.set(
+            EVENT_TYPES_KEY,
+            event_types,
+            getattr(settings, 'SPACES_CALENDAR_EVENT_TYPES_TIMEOUT', 5*60)
+        )
+    return event_types
+
+def invalidate_event_types():
+    calendar_cache().delete(EVENT_TYPES_KEY)
+
+def get_event_type(pk):
+    """
+    Returns the cached EventType with the given pk. Raises KeyError if there
+    is no such event type.
+    """
+    for event_type in get_event_types():
+        if event_type.pk == pk:
+            return event_type
+    raise KeyError(pk)
+
+def event_type_choices():
+    """
+    Choices for event type form fields, including an empty choice in the
+    first position like a ModelChoiceField would render it.
+    """
+    return [('', '---------')] + [(t.pk, str(t)) for t in get_event_types()]
+
+def events_version(calendar_events):
+    """
+    Cheap version token for a CalendarEvent queryset: a tuple of the number
+    of calendar events and the latest modification time (None if there are
+    none). One aggregate query.
+    """
+    from django.db.models import Count, Max
+    aggregate = calendar_events.aggregate(count=Count('pk'), modified=Max('modified'))
+    return (aggregate['count'], aggregate['modified'])
+
+def calendar_version(request):
+    """
+    events_version() of the calendar of the current space, memoized on the
+    request.
+    """
+    if not hasattr(request, '_calendar_version'):
+        from .models import CalendarEvent
+        request._calendar_version = events_version(
+            CalendarEvent.objects.filter(calendar__space=request.SPACE)
+        )
+    return request._calendar_version
+
+def quarter_cache_key(request, year, quarter):
+    """
+    Cache key for the computed month grids of a quarter of the current space.
+    """
+    count, modified = calendar_version(request)
+    return 'spaces_calendar:quarter-items:%s:%s:%s:%s:%s:%s' % (
+        request.SPACE.pk,
+        count,
+        modified.timestamp() if modified else 0,
+        timezone.get_current_timezone_name(),
+        year,
+        quarter,
+    )
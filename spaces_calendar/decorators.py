@@ -1,6 +1,16 @@
+import hashlib
+from datetime import datetime, time
+
+from django.contrib.messages import get_messages
 from django.core.exceptions import PermissionDenied
+from django.utils import timezone, translation
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from collab.util import is_owner_or_admin
 
+from .cache import calendar_version, get_event_types
+
 def event_owner_or_admin_required(func):
     """
     method decorator raising 403 if user is neither the owner of the event
@@ -17,3 +27,43 @@ def event_owner_or_admin_required(func):
                 return func(self, *args, **kwargs)
         raise PermissionDenied
     return _decorator
+
+def _start_of_today():
+    tzinfo = timezone.get_current_timezone()
+    today = timezone.localtime(timezone.now(), tzinfo).date()
+    return timezone.make_aware(datetime.combine(today, time()), tzinfo)
+
+def calendar_etag(request, *args, **kwargs):
+    """
+    ETag for the calendar grid views. Besides the calendar version it covers
+    everything else the rendered page depends on: user, language, time zone,
+    the current day and the event types. Pending messages disable the ETag,
+    they have to be rendered.
+
+    There is deliberately no Last-Modified validator: deleting an event
+    lowers the event count but not the latest modification time, so an
+    If-Modified-Since check would answer 304 for a stale grid.
+    """
+    if len(get_messages(request)):
+        return None
+    count, modified = calendar_version(request)
+    parts = [
+        request.SPACE.pk,
+        request.user.pk,
+        translation.get_language(),
+        timezone.get_current_timezone_name(),
+        _start_of_today().date().isoformat(),
+        count,
+        modified.isoformat() if modified else '',
+    ] + ['%s:%s' % (t.pk, t.label) for t in get_event_types()]
+    return hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+def calendar_condition(func):
+    """
+    view decorator answering conditional GET requests for the calendar grid
+    views with 304 before any occurrences get queried or rendered. Has to be
+    applied below permission_required_or_403.
+    """
+    func = condition(etag_func=calendar_etag)(func)
+    func = vary_on_headers('Cookie', 'Accept-Language')(func)
+    return cache_control(private=True, no_cache=True)(func)
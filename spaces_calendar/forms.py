@@ -1,10 +1,54 @@
 from django import forms
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
 from django.utils.translation import ugettext as _
 from swingtime.forms import SplitDateTimeWidget
 from swingtime.forms import EventForm as st_EventForm
 from swingtime.models import Occurrence, Event, EventType, Note
 
+from .cache import event_type_choices, get_event_type
+from .models import ReminderPreference
+
+class EventTypeChoiceField(forms.ChoiceField):
+    '''
+    Drop-in replacement for a ModelChoiceField over all EventTypes. Choices
+    and validation are served from the cached event types, so neither
+    rendering nor cleaning the field touches the database.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('choices', event_type_choices)
+        super(EventTypeChoiceField, self).__init__(*args, **kwargs)
+
+    def prepare_value(self, value):
+        if isinstance(value, EventType):
+            return value.pk
+        return value
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return get_event_type(int(value))
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+    def validate(self, value):
+        # to_python already made sure value is a known event type
+        forms.Field.validate(self, value)
+
+    def has_changed(self, initial, data):
+        initial = self.prepare_value(initial)
+        initial = '' if initial is None else str(initial)
+        data = '' if data is None else str(data)
+        return initial != data
+
 class SingleOccurrenceForm(forms.ModelForm):
     '''
     A simple form for adding and updating single Occurrence attributes
@@ -17,14 +61,16 @@ class SingleOccurrenceForm(forms.ModelForm):
     def save(self, event):
         start_time = self.cleaned_data['start_time']
         end_time = self.cleaned_data['end_time']
-        o = Occurrence.objects.filter(
-            event=event,
-        ).delete()
-        print('save():',start_time.tzinfo, start_time, o)
-        event.add_occurrences(
-            start_time,
-            end_time,
-        )
+        # replace the occurrences in one unit, so readers never see the
+        # event without any occurrence.
+        with transaction.atomic():
+            Occurrence.objects.filter(
+                event=event,
+            ).delete()
+            event.add_occurrences(
+                start_time,
+                end_time,
+            )
         return event
 
     class Meta:
@@ -32,6 +78,118 @@ class SingleOccurrenceForm(forms.ModelForm):
         fields = "__all__"
 
 
+class OccurrenceForm(forms.ModelForm):
+    '''
+    Edit a single existing Occurrence. With ``following`` checked, the
+    change of the start time is applied to all later occurrences of the
+    event as well.
+    '''
+    start_time = forms.DateTimeField(
+        label=_("Beginning"),
+        widget=forms.DateTimeInput(format='%Y-%m-%d %H:%M')
+    )
+    end_time = forms.DateTimeField(
+        label=_("End"),
+        widget=forms.DateTimeInput(format='%Y-%m-%d %H:%M')
+    )
+    following = forms.BooleanField(
+        label=_("Shift all following occurrences as well"),
+        required=False
+    )
+
+    class Meta:
+        model = Occurrence
+        fields = ('start_time', 'end_time')
+
+    def clean(self):
+        cleaned_data = super(OccurrenceForm, self).clean()
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if start_time and end_time and end_time < start_time:
+            self.add_error('end_time', _('The end must not be before the beginning.'))
+        return cleaned_data
+
+
+class LoadedInstanceChoiceField(forms.ModelChoiceField):
+    '''
+    ModelChoiceField resolving submitted primary keys from a dict of already
+    loaded instances instead of querying for each of them.
+    '''
+
+    def __init__(self, instances, *args, **kwargs):
+        self.instances = instances
+        super(LoadedInstanceChoiceField, self).__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.instances[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
+class BaseOccurrenceFormSet(forms.BaseModelFormSet):
+    '''
+    Edits all occurrences of an event at once. Pass the event's occurrences
+    as an ordered queryset; if it was evaluated before, it is not queried
+    again. Submitted occurrence ids are checked against these occurrences
+    as well, so validation needs no query per form.
+    '''
+
+    def add_fields(self, form, index):
+        super(BaseOccurrenceFormSet, self).add_fields(form, index)
+        if not hasattr(self, '_occurrences_by_pk'):
+            self._occurrences_by_pk = dict((str(o.pk), o) for o in self.get_queryset())
+        pk_name = self._pk_field.name
+        field = form.fields[pk_name]
+        form.fields[pk_name] = LoadedInstanceChoiceField(
+            self._occurrences_by_pk,
+            queryset=field.queryset,
+            initial=field.initial,
+            required=False,
+            widget=field.widget
+        )
+
+    def clean(self):
+        super(BaseOccurrenceFormSet, self).clean()
+        if self.forms and all(self._should_delete_form(form) for form in self.forms):
+            raise ValidationError(_('An event needs at least one occurrence.'))
+
+    def save(self, commit=True):
+        with transaction.atomic():
+            saved = super(BaseOccurrenceFormSet, self).save(commit)
+            # individually edited or deleted occurrences are left alone when
+            # shifting the following ones.
+            touched = [form.instance.pk for form in self.forms if form.has_changed()]
+            for form in self.forms:
+                if self._should_delete_form(form) or not form.cleaned_data.get('following'):
+                    continue
+                old_start = form.initial['start_time']
+                delta = form.cleaned_data['start_time'] - old_start
+                if delta:
+                    Occurrence.objects\
+                        .filter(event_id=form.instance.event_id, start_time__gt=old_start)\
+                        .exclude(pk__in=touched)\
+                        .update(
+                            start_time=F('start_time') + delta,
+                            end_time=F('end_time') + delta
+                        )
+        return saved
+
+OccurrenceFormSet = forms.modelformset_factory(
+    Occurrence,
+    form=OccurrenceForm,
+    formset=BaseOccurrenceFormSet,
+    extra=0,
+    can_delete=True
+)
+
+
 class EventForm(st_EventForm):
     '''
     A simple form for adding and updating Event attributes.
@@ -40,8 +198,7 @@ class EventForm(st_EventForm):
     enable descriptions of arbitrary length.
     '''
 
-    event_type = forms.ModelChoiceField(
-        queryset = EventType.objects.all(),
+    event_type = EventTypeChoiceField(
         widget = forms.RadioSelect(attrs={'required':'required'})
     )
     description = forms.CharField(
@@ -88,3 +245,64 @@ class EventForm(st_EventForm):
              note = self.cleaned_data['note']
         )
         return event
+
+class EventIdsField(forms.Field):
+    '''
+    A list of event ids as submitted by a group of checkboxes. Unlike a
+    ModelMultipleChoiceField this does not query the events, the view
+    resolves the selection itself.
+    '''
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return sorted(set(int(v) for v in value))
+        except (TypeError, ValueError):
+            raise ValidationError(_('Invalid selection.'), code='invalid')
+
+
+class BulkEventForm(forms.Form):
+    '''
+    Delete, shift or retype a selection of events at once.
+    '''
+    DELETE = 'delete'
+    SHIFT = 'shift'
+    EVENT_TYPE = 'event_type'
+    ACTIONS = (
+        (DELETE, _('Delete')),
+        (SHIFT, _('Shift by days')),
+        (EVENT_TYPE, _('Change event type')),
+    )
+
+    events = EventIdsField(label=_('Events'))
+    action = forms.ChoiceField(
+        choices = ACTIONS,
+        widget = forms.RadioSelect(attrs={'required':'required'})
+    )
+    offset_days = forms.IntegerField(label=_('Days'), required=False)
+    event_type = EventTypeChoiceField(label=_('Event type'), required=False)
+
+    def clean(self):
+        cleaned_data = super(BulkEventForm, self).clean()
+        action = cleaned_data.get('action')
+        if action == self.SHIFT and not cleaned_data.get('offset_days'):
+            self.add_error('offset_days', _('This field is required.'))
+        if action == self.EVENT_TYPE and not cleaned_data.get('event_type'):
+            self.add_error('event_type', _('This field is required.'))
+        return cleaned_data
+
+
+class ReminderForm(forms.Form):
+    '''
+    Lets a user choose if and when to get reminded of the events of the
+    current space.
+    '''
+    minutes_before = forms.TypedChoiceField(
+        label = _('Remind me'),
+        coerce = int,
+        empty_value = None,
+        required = False,
+        choices = (('', _('Never')),) + ReminderPreference.LEAD_TIMES,
+    )
@@ -0,0 +1,389 @@
+"""
+Load test harness for the calendar, driven by the calendar_loadtest
+management command. Simulates concurrent clients against a running
+server (e.g. "manage.py runserver") that reads and writes events, and
+samples database lock waits while it runs.
+"""
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin, urlparse
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.db import connection
+
+EVENT_URL = re.compile(r'/calendar/events/(\d+)/$')
+EVENT_LINK = re.compile(r'href="[^"]*/calendar/events/(\d+)/"')
+
+
+class FormParser(HTMLParser):
+    """
+    Collects the fields of all forms of a page with their default values,
+    the way a browser would submit them unchanged.
+    """
+    def __init__(self):
+        super(FormParser, self).__init__()
+        self.forms = []
+        self.choices = defaultdict(list)
+        self._form = None
+        self._textarea = None
+        self._select = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self._form = []
+            self.forms.append(self._form)
+        elif self._form is None:
+            return
+        elif tag == 'input' and attrs.get('name'):
+            name, kind = attrs['name'], attrs.get('type', 'text')
+            if kind in ('radio', 'checkbox'):
+                self.choices[name].append(attrs.get('value', 'on'))
+                if 'checked' not in attrs:
+                    return
+            if kind not in ('submit', 'button', 'image', 'file'):
+                self._form.append((name, attrs.get('value', '')))
+        elif tag == 'textarea' and attrs.get('name'):
+            self._textarea = [attrs['name'], '']
+        elif tag == 'select' and attrs.get('name'):
+            self._select = attrs['name']
+        elif tag == 'option' and self._select and 'selected' in attrs:
+            self._form.append((self._select, attrs.get('value', '')))
+
+    def handle_data(self, data):
+        if self._textarea is not None:
+            self._textarea[1] += data
+
+    def handle_endtag(self, tag):
+        if tag == 'textarea' and self._textarea is not None:
+            self._form.append(tuple(self._textarea))
+            self._textarea = None
+        elif tag == 'select':
+            self._select = None
+        elif tag == 'form':
+            self._form = None
+
+    def form_with(self, field):
+        """
+        Fields of the first form containing ``field`` as an ordered dict-like
+        list of (name, value) tuples.
+        """
+        for form in self.forms:
+            if any(name == field for name, value in form):
+                return list(form)
+        raise ValueError('No form with field %r found.' % field)
+
+
+def set_field(fields, name, value):
+    return [(n, v) for n, v in fields if n != name] + [(name, value)]
+
+
+class RedirectRecorder(HTTPRedirectHandler):
+    """
+    Follows redirects like the default handler and counts them, so a
+    redirect back to the same URL can be told apart from a re-rendered page.
+    """
+    redirects = 0
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        self.redirects += 1
+        return HTTPRedirectHandler.redirect_request(
+            self, req, fp, code, msg, headers, newurl
+        )
+
+
+class Client(object):
+    """
+    One simulated user with its own session. Raises ValueError if the login
+    fails; afterwards every request ending on the login page raises
+    ValueError as well, instead of passing as a fast successful one.
+    """
+    def __init__(self, base_url, login_url, username, password):
+        self.base_url = base_url
+        self.login_path = urlparse(self.url(login_url)).path
+        self.cookies = CookieJar()
+        self.redirect_recorder = RedirectRecorder()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), self.redirect_recorder)
+        page, url = self.open(login_url)
+        fields = self.parse(page).form_with('username')
+        fields = set_field(fields, 'username', username)
+        fields = set_field(fields, 'password', password)
+        page, url = self.open(login_url, fields)
+        logged_in = any(c.name == settings.SESSION_COOKIE_NAME for c in self.cookies)
+        if not logged_in or self.is_login_page(url):
+            raise ValueError('Login as %r failed.' % username)
+
+    def url(self, path):
+        return urljoin(self.base_url, path)
+
+    def is_login_page(self, url):
+        return urlparse(url).path == self.login_path
+
+    def open(self, path, fields=None):
+        """
+        GETs or, with ``fields``, POSTs to ``path``. Returns the page and its
+        final URL after redirects; ``self.redirected`` tells whether there
+        were any.
+        """
+        url = self.url(path)
+        if fields is None:
+            request = Request(url)
+        else:
+            request_data = urlencode(fields).encode('utf-8')
+            request = Request(url, data=request_data, headers={'Referer': url})
+        redirects = self.redirect_recorder.redirects
+        response = self.opener.open(request)
+        self.redirected = self.redirect_recorder.redirects > redirects
+        return response.read().decode('utf-8'), response.geturl()
+
+    def get(self, path):
+        page, url = self.open(path)
+        if self.is_login_page(url):
+            raise ValueError('Redirected to the login page.')
+        return page, url
+
+    def post(self, path, fields):
+        page, url = self.open(path, fields)
+        if self.is_login_page(url):
+            raise ValueError('Redirected to the login page.')
+        return page, url
+
+    def csrf_token(self):
+        """
+        The CSRF token from its cookie. With CSRF_USE_SESSIONS there is no
+        such cookie; use csrf_token_from() with a rendered form instead.
+        """
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def csrf_token_from(self, page):
+        """
+        The CSRF token of the first form of ``page`` containing one, falling
+        back to the cookie.
+        """
+        try:
+            fields = self.parse(page).form_with('csrfmiddlewaretoken')
+        except ValueError:
+            return self.csrf_token()
+        return dict(fields)['csrfmiddlewaretoken']
+
+    @staticmethod
+    def parse(page):
+        parser = FormParser()
+        parser.feed(page)
+        return parser
+
+
+class LoadTest(object):
+    """
+    Runs ``clients`` concurrent clients for ``duration`` seconds. Every
+    operation is a write with probability ``write_ratio``, otherwise a read.
+
+    Reads: quarterly view, month view, event detail.
+    Writes: add_event, editing an event through event_view and deleting
+    an event through DeleteEvent. Only events created by the load test get
+    edited or deleted.
+    """
+    READS = ('quarterly_view', 'month_view', 'event_detail')
+    WRITES = ('add_event', 'edit_event', 'delete_event')
+
+    def __init__(self, base_url, login_url, username, password,
+                 clients=10, duration=30, write_ratio=0.1, lock_interval=0.5):
+        self.base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.login_url = login_url
+        self.username = username
+        self.password = password
+        self.clients = clients
+        self.duration = duration
+        self.write_ratio = write_ratio
+        self.lock_interval = lock_interval
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_samples = []
+        self.event_ids = []
+        self.own_event_ids = []
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    # operations
+
+    def quarterly_view(self, client):
+        year = datetime.now().year + random.choice((-1, 0, 0, 1))
+        page, url = client.get('calendar/%d/Q%d/' % (year, random.randint(1, 4)))
+        self.remember_events(EVENT_LINK.findall(page))
+
+    def month_view(self, client):
+        client.get('calendar/%d/%d/' % (datetime.now().year, random.randint(1, 12)))
+
+    def event_detail(self, client):
+        event_id = self.pick(self.event_ids)
+        if event_id is None:
+            return self.quarterly_view(client)
+        client.get('calendar/events/%s/' % event_id)
+
+    def add_event(self, client):
+        page, url = client.get('calendar/events/add/')
+        parser = client.parse(page)
+        start = datetime.now() + timedelta(days=random.randint(-60, 60), hours=random.randint(0, 8))
+        fields = parser.form_with('title')
+        fields = set_field(fields, 'title', 'loadtest %d' % random.randint(0, 10**6))
+        fields = set_field(fields, 'description', 'Created by calendar_loadtest.')
+        fields = set_field(fields, 'event_type', random.choice(parser.choices['event_type']))
+        fields = set_field(fields, 'start_time', start.strftime('%Y-%m-%d %H:%M'))
+        fields = set_field(fields, 'end_time', (start + timedelta(hours=2)).strftime('%Y-%m-%d %H:%M'))
+        page, url = client.post('calendar/events/add/', fields)
+        match = EVENT_URL.search(url)
+        if not match:
+            raise ValueError('add_event did not redirect to the new event.')
+        with self.lock:
+            self.own_event_ids.append(match.group(1))
+            self.event_ids.append(match.group(1))
+
+    def edit_event(self, client):
+        event_id = self.pick(self.own_event_ids)
+        if event_id is None:
+            return self.add_event(client)
+        path = 'calendar/events/%s/' % event_id
+        page, url = client.get(path)
+        fields = client.parse(page).form_with('title')
+        fields = set_field(fields, 'title', 'loadtest %d' % random.randint(0, 10**6))
+        page, url = client.post(path, fields)
+        # a successful update redirects back to the event, an invalid one
+        # re-renders the form
+        if not client.redirected or urlparse(url).path != urlparse(client.url(path)).path:
+            raise ValueError('edit_event did not redirect back to the event.')
+
+    def delete_event(self, client):
+        with self.lock:
+            if not self.own_event_ids:
+                event_id = None
+            else:
+                event_id = self.own_event_ids.pop(random.randrange(len(self.own_event_ids)))
+                self.event_ids.remove(event_id)
+        if event_id is None:
+            return self.add_event(client)
+        path = 'calendar/events/delete/%s/' % event_id
+        page, url = client.get(path)
+        client.post(path, [('csrfmiddlewaretoken', client.csrf_token_from(page))])
+
+    # helpers
+
+    def pick(self, ids):
+        with self.lock:
+            return random.choice(ids) if ids else None
+
+    def remember_events(self, event_ids):
+        with self.lock:
+            known = set(self.event_ids)
+            self.event_ids.extend(e for e in set(event_ids) if e not in known)
+
+    def run_client(self):
+        try:
+            client = Client(self.base_url, self.login_url, self.username, self.password)
+        except Exception:
+            with self.lock:
+                self.errors['login'] += 1
+            return
+        while not self.stop.is_set():
+            if random.random() < self.write_ratio:
+                operation = random.choice(self.WRITES)
+            else:
+                operation = random.choice(self.READS)
+            started = time.perf_counter()
+            try:
+                getattr(self, operation)(client)
+            except (HTTPError, OSError, ValueError):
+                with self.lock:
+                    self.errors[operation] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.latencies[operation].append(elapsed)
+
+    def sample_lock_waits(self):
+        """
+        Periodically counts sessions waiting for a database lock. Supported
+        for PostgreSQL and MySQL.
+        """
+        if connection.vendor == 'postgresql':
+            query = "SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock'"
+        elif connection.vendor == 'mysql':
+            query = "SELECT count(*) FROM information_schema.innodb_trx WHERE trx_state = 'LOCK WAIT'"
+        else:
+            return
+        try:
+            while not self.stop.wait(self.lock_interval):
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+                    self.lock_samples.append(cursor.fetchone()[0])
+        finally:
+            connection.close()
+
+    def run(self):
+        threads = [threading.Thread(target=self.run_client) for i in range(self.clients)]
+        sampler = threading.Thread(target=self.sample_lock_waits)
+        started = time.perf_counter()
+        sampler.start()
+        for thread in threads:
+            thread.start()
+        time.sleep(self.duration)
+        self.stop.set()
+        for thread in threads + [sampler]:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self):
+        """
+        Returns the results as a list of text lines.
+        """
+        lines = ['%-15s %8s %8s %8s %8s %8s %8s' % (
+            'operation', 'count', 'errors', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms'
+        )]
+        total = 0
+        for operation in self.READS + self.WRITES:
+            latencies = sorted(self.latencies[operation])
+            total += len(latencies)
+            lines.append('%-15s %8d %8d %8.1f %8s %8s %8s' % (
+                operation,
+                len(latencies),
+                self.errors[operation],
+                len(latencies) / self.elapsed,
+                percentile(latencies, 50),
+                percentile(latencies, 90),
+                percentile(latencies, 99),
+            ))
+        lines.append('total: %d requests in %.1fs, %.1f req/s, %d login errors' % (
+            total, self.elapsed, total / self.elapsed, self.errors['login']
+        ))
+        if self.lock_samples:
+            waiting = [s for s in self.lock_samples if s]
+            lines.append('lock waits: %d of %d samples, max %d waiting, mean %.2f' % (
+                len(waiting),
+                len(self.lock_samples),
+                max(self.lock_samples),
+                sum(self.lock_samples) / len(self.lock_samples),
+            ))
+        else:
+            lines.append('lock waits: not sampled (%s)' % connection.vendor)
+        return lines
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile in milliseconds, '-' for no values.
+    """
+    if not sorted_values:
+        return '-'
+    index = max(int(round(p / 100.0 * len(sorted_values))) - 1, 0)
+    return '%.0f' % (sorted_values[index] * 1000)
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from spaces_calendar.archive import archive_before, archive_horizon, archivable_event_ids
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves calendar events whose occurrences all ended before the archive '
+        'horizon into the archive tables. Safe to run periodically, e.g. '
+        'from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Archive events that ended more than DAYS days ago. '
+                 'Defaults to the SPACES_CALENDAR_ARCHIVE_DAYS setting.'
+        )
+        parser.add_argument(
+            '--before',
+            help='Archive events that ended before this date (YYYY-MM-DD).'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many events would be archived.'
+        )
+
+    def handle(self, *args, **options):
+        if options['before'] and options['days'] is not None:
+            raise CommandError('Use either --before or --days, not both.')
+        if options['before']:
+            try:
+                before = datetime.strptime(options['before'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--before must be a date like 2016-01-31.')
+            before = timezone.make_aware(before, timezone.get_current_timezone())
+        elif options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+        else:
+            before = archive_horizon()
+
+        if options['dry_run']:
+            count = len(archivable_event_ids(before))
+            self.stdout.write('%d events would be archived.' % count)
+            return
+        count = archive_before(before, batch_size=options['batch_size'])
+        self.stdout.write('%d events archived.' % count)
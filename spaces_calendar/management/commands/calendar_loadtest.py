@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from spaces_calendar.loadtest import LoadTest
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives a mixed read/write workload against the calendar of a space on '
+        'a running server and reports throughput, latency percentiles and '
+        'database lock waits. Run it against a test server sharing the '
+        'database configured here, never against production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'base_url',
+            help='URL of the space, e.g. http://127.0.0.1:8000/spaces/test/'
+        )
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument(
+            '--login-url', default='/accounts/login/',
+            help='Login page, relative to the server root.'
+        )
+        parser.add_argument('--clients', type=int, default=10)
+        parser.add_argument('--duration', type=int, default=30, help='Seconds.')
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help='Share of write operations, between 0 and 1.'
+        )
+        parser.add_argument(
+            '--lock-interval', type=float, default=0.5,
+            help='Seconds between two samples of database lock waits.'
+        )
+
+    def handle(self, *args, **options):
+        load_test = LoadTest(
+            options['base_url'],
+            options['login_url'],
+            options['username'],
+            options['password'],
+            clients=options['clients'],
+            duration=options['duration'],
+            write_ratio=options['write_ratio'],
+            lock_interval=options['lock_interval'],
+        )
+        for line in load_test.run():
+            self.stdout.write(line)
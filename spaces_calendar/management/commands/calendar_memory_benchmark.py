@@ -0,0 +1,86 @@
+import gc
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from swingtime.models import Occurrence
+
+from spaces_calendar.occurrences import occurrence_items
+from spaces_calendar.views import QUARTER_MONTHS, month_filter
+
+
+def traced(load):
+    """
+    Calls ``load`` under tracemalloc and returns (rows, current, peak) with
+    the number of loaded rows and the retained and peak memory in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = load()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return len(result), current, peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the memory needed for a quarter's occurrences as model "
+        "instances (with their event and event type) and as OccurrenceItems."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Defaults to the current year.')
+        parser.add_argument('--quarter', type=int, help='1-4, defaults to the current quarter.')
+        parser.add_argument(
+            '--calendar', type=int,
+            help='Only load the occurrences of this SpacesCalendar id.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1,
+            help='Load the rows REPEAT times, to scale up small databases.'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.localtime(timezone.now())
+        year = options['year'] or now.year
+        quarter = options['quarter'] or (now.month - 1) // 3 + 1
+        if not 1 <= quarter <= 4:
+            raise CommandError('--quarter must be between 1 and 4.')
+
+        q = Q()
+        for month in QUARTER_MONTHS[quarter-1]:
+            q |= month_filter(year, month)
+        queryset = Occurrence.objects.filter(q)
+        if options['calendar']:
+            queryset = queryset.filter(event__calendarevent__calendar_id=options['calendar'])
+        repeat = range(options['repeat'])
+
+        def models():
+            return [
+                o for i in repeat
+                for o in queryset.select_related('event__event_type')
+            ]
+
+        def items():
+            return [o for i in repeat for o in occurrence_items(queryset)]
+
+        self.stdout.write('Q%d %d' % (quarter, year))
+        self.stdout.write('%-16s %8s %12s %12s %10s' % (
+            '', 'rows', 'retained KiB', 'peak KiB', 'bytes/row'
+        ))
+        results = []
+        for name, load in (('model instances', models), ('OccurrenceItems', items)):
+            rows, current, peak = traced(load)
+            results.append(peak)
+            self.stdout.write('%-16s %8d %12.1f %12.1f %10s' % (
+                name, rows, current / 1024.0, peak / 1024.0,
+                current // rows if rows else '-'
+            ))
+        if results[0]:
+            self.stdout.write('OccurrenceItems peak: %.0f%% of model instances' % (
+                100.0 * results[1] / results[0]
+            ))
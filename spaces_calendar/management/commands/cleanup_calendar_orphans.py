@@ -0,0 +1,36 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from swingtime.models import Event, Note
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes swingtime Events without a CalendarEvent and event Notes '
+        'without an Event, as left behind by interrupted event creation.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report what would be deleted.'
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(calendarevent__isnull=True)
+        notes = Note.objects\
+                    .filter(content_type=ContentType.objects.get_for_model(Event))\
+                    .exclude(object_id__in=Event.objects.values('pk'))
+
+        if options['dry_run']:
+            self.stdout.write('%d orphaned events would be deleted.' % events.count())
+            self.stdout.write('%d orphaned notes would be deleted.' % notes.count())
+            return
+
+        with transaction.atomic():
+            # deleting events cascades to their occurrences and notes
+            event_count = events.delete()[1].get(Event._meta.label, 0)
+            note_count = notes.delete()[1].get(Note._meta.label, 0)
+        self.stdout.write('%d orphaned events deleted.' % event_count)
+        self.stdout.write('%d orphaned notes deleted.' % note_count)
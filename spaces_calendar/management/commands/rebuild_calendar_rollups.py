@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from spaces_calendar.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the calendar statistics rollups from all occurrences.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'calendar_ids', nargs='*', type=int,
+            help='Only rebuild the rollups of these SpacesCalendar ids.'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(options['calendar_ids'] or None)
+        self.stdout.write('Rollups of %d months rebuilt.' % count)
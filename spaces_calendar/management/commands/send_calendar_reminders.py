@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from spaces_calendar.reminders import due_reminders, send_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends reminders for upcoming events to all users who asked for them. '
+        'Meant to run periodically, e.g. every 5 minutes from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many reminders are due.'
+        )
+
+    def handle(self, *args, **options):
+        due = due_reminders()
+        if options['dry_run']:
+            count = sum(len(reminder[3]) for reminder in due)
+            self.stdout.write('%d reminders are due.' % count)
+            return
+        count = send_reminders(due, batch_size=options['batch_size'])
+        self.stdout.write('%d reminders sent.' % count)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('swingtime', '__first__'),
+        ('spaces_calendar', '0005_calendarevent_author'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=32, verbose_name='title')),
+                ('description', models.TextField(blank=True, verbose_name='description')),
+                ('archived', models.DateTimeField(auto_now_add=True)),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='spaces_calendar.SpacesCalendar')),
+                ('event_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='swingtime.EventType')),
+            ],
+            options={
+                'verbose_name': 'archived event',
+                'verbose_name_plural': 'archived events',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOccurrence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField(db_index=True, verbose_name='start time')),
+                ('end_time', models.DateTimeField(verbose_name='end time')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='spaces_calendar.ArchivedEvent')),
+            ],
+            options={
+                'ordering': ('start_time', 'end_time'),
+                'verbose_name': 'archived occurrence',
+                'verbose_name_plural': 'archived occurrences',
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# at most 30 characters, the limit of models.Index before Django 3.0
+START_TIME_INDEX = 'spcal_occ_start_time_idx'
+
+def start_time_index():
+    return models.Index(fields=['start_time'], name=START_TIME_INDEX)
+
+# swingtime does not index Occurrence.start_time, but the reminder scan (and
+# every calendar view) filters on it. The model belongs to swingtime, so the
+# index is created through the schema editor, which emits the right SQL for
+# every database backend, without touching the migration state.
+
+def add_start_time_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('swingtime', 'Occurrence'), start_time_index())
+
+def remove_start_time_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('swingtime', 'Occurrence'), start_time_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('swingtime', '__first__'),
+        ('spaces_calendar', '0007_calendarevent_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderPreference',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutes_before', models.PositiveIntegerField(choices=[(15, '15 minutes before'), (60, '1 hour before'), (1440, '1 day before'), (10080, '1 week before')], default=1440, verbose_name='reminder')),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='spaces_calendar.SpacesCalendar')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'reminder preference',
+                'verbose_name_plural': 'reminder preferences',
+            },
+        ),
+        migrations.CreateModel(
+            name='SentReminder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent', models.DateTimeField(auto_now_add=True)),
+                ('occurrence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='swingtime.Occurrence')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='reminderpreference',
+            unique_together=set([('user', 'calendar')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='sentreminder',
+            unique_together=set([('user', 'occurrence')]),
+        ),
+        migrations.RunPython(add_start_time_index, remove_start_time_index),
+    ]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('swingtime', '__first__'),
+        ('spaces_calendar', '0008_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='spaces_calendar.SpacesCalendar')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CalendarRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('occurrence_count', models.PositiveIntegerField(default=0)),
+                ('minutes_booked', models.PositiveIntegerField(default=0)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='spaces_calendar.SpacesCalendar')),
+                ('event_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='swingtime.EventType')),
+            ],
+            options={
+                'ordering': ('month', 'event_type'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='calendarrollup',
+            unique_together=set([('calendar', 'month', 'event_type')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='authorrollup',
+            unique_together=set([('calendar', 'month', 'author')]),
+        ),
+    ]
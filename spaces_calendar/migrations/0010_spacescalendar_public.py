@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spaces_calendar', '0009_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spacescalendar',
+            name='is_published',
+            field=models.BooleanField(default=False, verbose_name='published'),
+        ),
+        migrations.AddField(
+            model_name='spacescalendar',
+            name='public_token',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -2,9 +2,10 @@ from django.conf import settings
 from django.db import models
 from spaces.models import Space,SpacePluginRegistry, SpacePlugin, SpaceModel
 from django.urls import reverse
+from django.utils.crypto import get_random_string
 from django.utils.translation import ugettext_lazy as _
 
-from swingtime.models import Event
+from swingtime.models import Event, EventType, Occurrence
 
 
 class SpacesCalendar(SpacePlugin):
@@ -15,8 +16,29 @@ class SpacesCalendar(SpacePlugin):
     """
     # active field (boolean) inherited from SpacePlugin
     # space field (foreignkey) inherited from SpacePlugin
+    # a published calendar can be read by anyone knowing its public token,
+    # see views.public_month_view.
+    is_published = models.BooleanField(_('published'), default=False)
+    public_token = models.CharField(max_length=32, unique=True, null=True, blank=True)
     reverse_url = 'spaces_calendar:index'
 
+    def publish(self):
+        """
+        Publish the calendar, generating a public token if necessary.
+        """
+        if not self.public_token:
+            self.public_token = get_random_string(32)
+        self.is_published = True
+        self.save(update_fields=['is_published', 'public_token'])
+
+    def unpublish(self):
+        """
+        Stop publishing the calendar. The token is kept, so publishing it
+        again restores existing embeds.
+        """
+        self.is_published = False
+        self.save(update_fields=['is_published'])
+
 
 class CalendarEvent(SpaceModel):
     """
@@ -25,6 +47,9 @@ class CalendarEvent(SpaceModel):
     event = models.OneToOneField(Event, on_delete=models.CASCADE)
     calendar = models.ForeignKey(SpacesCalendar, on_delete=models.CASCADE)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # bumped on every change of the event or its occurrences, used for
+    # conditional responses of the calendar views.
+    modified = models.DateTimeField(auto_now=True, db_index=True)
 
     spaceplugin_field_name = "calendar"
 
@@ -39,6 +64,125 @@ class CalendarEvent(SpaceModel):
         return reverse('spaces_calendar:event', args=[str(self.event.id)])
     
 
+class ArchivedEvent(models.Model):
+    """
+    Read-only copy of a CalendarEvent whose occurrences all lie before the
+    archive horizon. Created by the archive_calendar management command,
+    which removes the original swingtime Event afterwards. The primary key
+    is the id of the original Event.
+    """
+    id = models.PositiveIntegerField(primary_key=True)
+    calendar = models.ForeignKey(SpacesCalendar, on_delete=models.CASCADE)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL)
+    event_type = models.ForeignKey(EventType, null=True, on_delete=models.SET_NULL)
+    title = models.CharField(_('title'), max_length=32)
+    description = models.TextField(_('description'), blank=True)
+    archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('archived event')
+        verbose_name_plural = _('archived events')
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedOccurrence(models.Model):
+    """
+    An occurrence of an ArchivedEvent. Offers the attributes the calendar
+    templates use on swingtime Occurrences.
+    """
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='occurrences')
+    start_time = models.DateTimeField(_('start time'), db_index=True)
+    end_time = models.DateTimeField(_('end time'))
+
+    archived = True
+
+    class Meta:
+        ordering = ('start_time', 'end_time')
+        verbose_name = _('archived occurrence')
+        verbose_name_plural = _('archived occurrences')
+
+    def __str__(self):
+        return '{}: {}'.format(self.title, self.start_time.isoformat())
+
+    @property
+    def title(self):
+        return self.event.title
+
+    @property
+    def event_type(self):
+        return self.event.event_type
+
+
+class ReminderPreference(models.Model):
+    """
+    A user's wish to get reminded of upcoming events of a space calendar.
+    """
+    LEAD_TIMES = (
+        (15, _('15 minutes before')),
+        (60, _('1 hour before')),
+        (24*60, _('1 day before')),
+        (7*24*60, _('1 week before')),
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    calendar = models.ForeignKey(SpacesCalendar, on_delete=models.CASCADE)
+    minutes_before = models.PositiveIntegerField(_('reminder'), choices=LEAD_TIMES, default=24*60)
+
+    class Meta:
+        unique_together = (('user', 'calendar'),)
+        verbose_name = _('reminder preference')
+        verbose_name_plural = _('reminder preferences')
+
+    def __str__(self):
+        return '{}: {}'.format(self.user, self.get_minutes_before_display())
+
+
+class SentReminder(models.Model):
+    """
+    Records that a user was reminded of an occurrence, so every reminder
+    goes out only once.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    occurrence = models.ForeignKey(Occurrence, on_delete=models.CASCADE)
+    sent = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (('user', 'occurrence'),)
+
+
+class CalendarRollup(models.Model):
+    """
+    Precomputed statistics of a space calendar for one month (by occurrence
+    start) and event type. Kept up to date by spaces_calendar.rollups on
+    every event write, rebuilt by the rebuild_calendar_rollups command.
+    """
+    calendar = models.ForeignKey(SpacesCalendar, on_delete=models.CASCADE)
+    month = models.DateField()
+    event_type = models.ForeignKey(EventType, null=True, on_delete=models.CASCADE)
+    event_count = models.PositiveIntegerField(default=0)
+    occurrence_count = models.PositiveIntegerField(default=0)
+    minutes_booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('calendar', 'month', 'event_type'),)
+        ordering = ('month', 'event_type')
+
+
+class AuthorRollup(models.Model):
+    """
+    Number of events per author and month of a space calendar, maintained
+    together with CalendarRollup.
+    """
+    calendar = models.ForeignKey(SpacesCalendar, on_delete=models.CASCADE)
+    month = models.DateField()
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    event_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('calendar', 'month', 'author'),)
+
+
 class CalendarPlugin(SpacePluginRegistry):
     """
     Provide a calendar plugin for Spaces. This makes the CalendarPlugin class
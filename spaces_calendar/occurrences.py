@@ -0,0 +1,38 @@
+class OccurrenceItem(object):
+    """
+    Compact, read-only stand-in for a swingtime Occurrence carrying only the
+    fields the calendar grids render. Much smaller than a model instance
+    with its select_related event and event type, and cheap to pickle into
+    the calendar cache.
+    """
+    __slots__ = (
+        'pk', 'event_id', 'event_type_id', 'title', 'start_time', 'end_time',
+        'archived'
+    )
+
+    def __init__(self, pk, event_id, event_type_id, title, start_time, end_time, archived=False):
+        self.pk = pk
+        self.event_id = event_id
+        self.event_type_id = event_type_id
+        self.title = title
+        self.start_time = start_time
+        self.end_time = end_time
+        self.archived = archived
+
+    def __repr__(self):
+        return '<OccurrenceItem: {} {}>'.format(self.title, self.start_time.isoformat())
+
+
+# field order matches OccurrenceItem.__init__. Works for swingtime
+# Occurrences as well as for ArchivedOccurrences.
+ITEM_FIELDS = ('pk', 'event_id', 'event__event_type', 'event__title', 'start_time', 'end_time')
+
+def occurrence_items(queryset, archived=False):
+    """
+    Fetches the occurrences of ``queryset`` as OccurrenceItems, with a single
+    values_list query and without instantiating any model.
+    """
+    return [
+        OccurrenceItem(*row, archived=archived)
+        for row in queryset.values_list(*ITEM_FIELDS)
+    ]
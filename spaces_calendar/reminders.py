@@ -0,0 +1,164 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from swingtime.models import Occurrence
+
+from .models import CalendarEvent, ReminderPreference, SentReminder, SpacesCalendar
+
+REMINDER_NOTICE = 'spaces_calendar_event_reminder'
+
+def has_space_access(user, space):
+    return user.has_perm('access_space', space)
+
+def _members(user_calendars):
+    """
+    Returns the subset of the given (user_id, calendar_id) pairs whose user
+    may still access the calendar's space. Users who left or were removed
+    from a space get no more reminders. Users and calendars are loaded with
+    one query each, every user instance is shared between its checks.
+    """
+    users = get_user_model().objects.in_bulk(list(set(u for u, c in user_calendars)))
+    calendars = SpacesCalendar.objects\
+                    .select_related('space')\
+                    .in_bulk(list(set(c for u, c in user_calendars)))
+    access = {}
+    members = set()
+    for user_id, calendar_id in user_calendars:
+        if user_id not in users or calendar_id not in calendars:
+            continue
+        space = calendars[calendar_id].space
+        key = (user_id, space.pk)
+        if key not in access:
+            access[key] = has_space_access(users[user_id], space)
+        if access[key]:
+            members.add((user_id, calendar_id))
+    return members
+
+def due_reminders(now=None):
+    """
+    Returns a list of (occurrence_id, event_id, start_time, user_ids) tuples
+    for all reminders that are due and have not been sent yet.
+
+    Needs three queries regardless of the number of upcoming occurrences:
+    the reminder preferences, one range scan over Occurrence.start_time
+    up to the longest lead time, restricted to calendars with preferences,
+    and the reminders already sent within that window. Space membership is
+    only checked for users with a due reminder, see _members().
+    """
+    now = now or timezone.now()
+    preferences = defaultdict(list)
+    max_lead = 0
+    for user_id, calendar_id, minutes_before in ReminderPreference.objects\
+            .values_list('user_id', 'calendar_id', 'minutes_before'):
+        preferences[calendar_id].append((user_id, timedelta(minutes=minutes_before)))
+        max_lead = max(max_lead, minutes_before)
+    if not preferences:
+        return []
+
+    window_end = now + timedelta(minutes=max_lead)
+    occurrences = Occurrence.objects\
+                    .filter(
+                        start_time__gt=now,
+                        start_time__lte=window_end,
+                        event__calendarevent__calendar_id__in=list(preferences)
+                    )\
+                    .order_by('start_time')\
+                    .values_list('pk', 'event_id', 'start_time', 'event__calendarevent__calendar_id')
+    sent = set(
+        SentReminder.objects
+            .filter(occurrence__start_time__gt=now, occurrence__start_time__lte=window_end)
+            .values_list('user_id', 'occurrence_id')
+    )
+
+    due = []
+    for occurrence_id, event_id, start_time, calendar_id in occurrences.iterator():
+        user_ids = [
+            user_id for user_id, lead in preferences.get(calendar_id, ())
+            if start_time - lead <= now and (user_id, occurrence_id) not in sent
+        ]
+        if user_ids:
+            due.append((occurrence_id, event_id, start_time, calendar_id, user_ids))
+    if not due:
+        return []
+
+    members = _members(set(
+        (user_id, calendar_id)
+        for occurrence_id, event_id, start_time, calendar_id, user_ids in due
+        for user_id in user_ids
+    ))
+    due = [
+        (occurrence_id, event_id, start_time, [
+            user_id for user_id in user_ids if (user_id, calendar_id) in members
+        ])
+        for occurrence_id, event_id, start_time, calendar_id, user_ids in due
+    ]
+    return [reminder for reminder in due if reminder[3]]
+
+def send_reminders(due, batch_size=500):
+    """
+    Sends the reminders returned by due_reminders(), batch_size occurrences
+    at a time. Each batch is first recorded as sent and then handed to the
+    notification system. Returns the number of reminders.
+
+    Overlapping runs are serialized by locking the batch's occurrences;
+    reminders another run recorded in the meantime are skipped, so every
+    reminder is sent once.
+    """
+    from pinax.notifications.models import send as send_notification
+    User = get_user_model()
+    count = 0
+    for i in range(0, len(due), batch_size):
+        batch = due[i:i+batch_size]
+        occurrence_ids = [reminder[0] for reminder in batch]
+        with transaction.atomic():
+            list(
+                Occurrence.objects
+                    .select_for_update()
+                    .filter(pk__in=occurrence_ids)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+            )
+            sent = set(
+                SentReminder.objects
+                    .filter(occurrence__pk__in=occurrence_ids)
+                    .values_list('user_id', 'occurrence_id')
+            )
+            batch = [
+                (occurrence_id, event_id, start_time, [
+                    user_id for user_id in reminder_users
+                    if (user_id, occurrence_id) not in sent
+                ])
+                for occurrence_id, event_id, start_time, reminder_users in batch
+            ]
+            batch = [reminder for reminder in batch if reminder[3]]
+            SentReminder.objects.bulk_create([
+                SentReminder(user_id=user_id, occurrence_id=occurrence_id)
+                for occurrence_id, event_id, start_time, reminder_users in batch
+                for user_id in reminder_users
+            ])
+        if not batch:
+            continue
+        user_ids = set(user_id for reminder in batch for user_id in reminder[3])
+        users = User.objects.in_bulk(list(user_ids))
+        calendar_events = {
+            ce.event_id: ce for ce in CalendarEvent.objects
+                .filter(event__pk__in=[reminder[1] for reminder in batch])
+                .select_related('event', 'calendar__space')
+        }
+        for occurrence_id, event_id, start_time, reminder_users in batch:
+            calendar_event = calendar_events[event_id]
+            send_notification(
+                [users[user_id] for user_id in reminder_users if user_id in users],
+                REMINDER_NOTICE,
+                {
+                    'calendar_event': calendar_event,
+                    'space': calendar_event.calendar.space,
+                    'start_time': start_time,
+                }
+            )
+            count += len(reminder_users)
+    return count
@@ -0,0 +1,163 @@
+from collections import defaultdict
+from datetime import datetime
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from swingtime.models import Occurrence
+
+from .models import ArchivedOccurrence, AuthorRollup, CalendarRollup, SpacesCalendar
+
+def rollup_timezone():
+    """
+    The time zone months are bucketed in. Fixed to settings.TIME_ZONE, so
+    requests in per-user time zones and the rebuild command agree on the
+    month boundaries.
+    """
+    return pytz.timezone(settings.TIME_ZONE)
+
+def month_of(dt):
+    """
+    First day of the month of the given datetime, see rollup_timezone().
+    """
+    return timezone.localtime(dt, rollup_timezone()).date().replace(day=1)
+
+def _month_range(month):
+    tzinfo = rollup_timezone()
+    if month.month == 12:
+        next_month = month.replace(year=month.year+1, month=1)
+    else:
+        next_month = month.replace(month=month.month+1)
+    return (
+        timezone.make_aware(datetime(month.year, month.month, 1), tzinfo),
+        timezone.make_aware(datetime(next_month.year, next_month.month, 1), tzinfo),
+    )
+
+def event_months(event_ids):
+    """
+    Returns the set of (calendar_id, month) pairs the occurrences of the given
+    events fall into. Collect them before and after a write and pass the
+    union to refresh_rollups().
+    """
+    return set(
+        (calendar_id, month_of(start_time))
+        for calendar_id, start_time in Occurrence.objects
+            .filter(event__pk__in=event_ids, event__calendarevent__isnull=False)
+            .values_list('event__calendarevent__calendar_id', 'start_time')
+    )
+
+def refresh_rollups(calendar_months):
+    """
+    Recomputes the rollups of the given (calendar_id, month) pairs from the
+    occurrences (live and archived) of just those months.
+
+    The calendars are locked first and stay locked until the surrounding
+    transaction ends. Concurrent refreshes of the same calendar thus run one
+    after the other, each reading the other's committed occurrences, instead
+    of inserting the same rollup rows twice.
+    """
+    calendar_months = sorted(calendar_months)
+    if not calendar_months:
+        return
+    with transaction.atomic():
+        list(
+            SpacesCalendar.objects
+                .select_for_update()
+                .filter(pk__in=set(calendar_id for calendar_id, month in calendar_months))
+                .order_by('pk')
+                .values_list('pk', flat=True)
+        )
+        for calendar_id, month in calendar_months:
+            _refresh_month(calendar_id, month)
+
+def _refresh_month(calendar_id, month):
+    """
+    Replaces the rollups of one calendar month, see refresh_rollups().
+    """
+    start, end = _month_range(month)
+    rows = list(
+        Occurrence.objects
+            .filter(
+                event__calendarevent__calendar_id=calendar_id,
+                start_time__gte=start,
+                start_time__lt=end
+            )
+            .values_list(
+                'event_id', 'event__event_type',
+                'event__calendarevent__author', 'start_time', 'end_time'
+            )
+    )
+    rows += list(
+        ArchivedOccurrence.objects
+            .filter(event__calendar_id=calendar_id, start_time__gte=start, start_time__lt=end)
+            .values_list('event_id', 'event__event_type', 'event__author', 'start_time', 'end_time')
+    )
+
+    events = defaultdict(set)
+    occurrences = defaultdict(int)
+    minutes = defaultdict(int)
+    authors = defaultdict(set)
+    for event_id, event_type_id, author_id, start_time, end_time in rows:
+        events[event_type_id].add(event_id)
+        occurrences[event_type_id] += 1
+        minutes[event_type_id] += max(int((end_time - start_time).total_seconds() // 60), 0)
+        if author_id is not None:
+            authors[author_id].add(event_id)
+
+    CalendarRollup.objects.filter(calendar_id=calendar_id, month=month).delete()
+    AuthorRollup.objects.filter(calendar_id=calendar_id, month=month).delete()
+    CalendarRollup.objects.bulk_create([
+        CalendarRollup(
+            calendar_id=calendar_id,
+            month=month,
+            event_type_id=event_type_id,
+            event_count=len(events[event_type_id]),
+            occurrence_count=occurrences[event_type_id],
+            minutes_booked=minutes[event_type_id],
+        )
+        for event_type_id in events
+    ])
+    AuthorRollup.objects.bulk_create([
+        AuthorRollup(
+            calendar_id=calendar_id,
+            month=month,
+            author_id=author_id,
+            event_count=len(event_ids),
+        )
+        for author_id, event_ids in authors.items()
+    ])
+
+def rebuild_rollups(calendar_ids=None):
+    """
+    Drops and recomputes all rollups, optionally only for the given calendars.
+    Returns the number of refreshed months.
+    """
+    occurrences = Occurrence.objects.filter(event__calendarevent__isnull=False)
+    archived = ArchivedOccurrence.objects.all()
+    rollups = CalendarRollup.objects.all()
+    author_rollups = AuthorRollup.objects.all()
+    if calendar_ids is not None:
+        occurrences = occurrences.filter(event__calendarevent__calendar_id__in=calendar_ids)
+        archived = archived.filter(event__calendar_id__in=calendar_ids)
+        rollups = rollups.filter(calendar_id__in=calendar_ids)
+        author_rollups = author_rollups.filter(calendar_id__in=calendar_ids)
+
+    calendar_months = set(
+        (calendar_id, month_of(start_time))
+        for calendar_id, start_time in occurrences
+            .values_list('event__calendarevent__calendar_id', 'start_time')
+            .iterator()
+    )
+    calendar_months.update(
+        (calendar_id, month_of(start_time))
+        for calendar_id, start_time in archived
+            .values_list('event__calendar_id', 'start_time')
+            .iterator()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        author_rollups.delete()
+        refresh_rollups(calendar_months)
+    return len(calendar_months)
@@ -14,3 +14,15 @@ def create_notice_types(sender, **kwargs):
             _('An event has been modified.'),
             _('An event has been modified.')
         )
+        register_notification(
+            'spaces_calendar_event_reminder',
+            _('An event starts soon.'),
+            _('Reminder for an upcoming event.')
+        )
+
+def event_type_changed(sender, **kwargs):
+    """
+    Drops the cached event types whenever an EventType is saved or deleted.
+    """
+    from .cache import invalidate_event_types
+    invalidate_event_types()
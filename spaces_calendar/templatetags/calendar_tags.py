@@ -1,6 +1,8 @@
 from django import template
 from django.utils.translation import ugettext as _
 
+from spaces_calendar.cache import get_event_types
+
 register = template.Library()
 
 @register.simple_tag
@@ -17,6 +19,15 @@ def lookup(obj, *args):
             return ''
     return obj
 
+@register.simple_tag
+def event_types():
+    """
+    Returns all event types from the calendar cache.
+    Usage:
+    {% event_types as types %}
+    """
+    return get_event_types()
+
 @register.filter(name="strftime")
 def strftime(d, arg):
     return _(d.strftime(arg))
@@ -1,3 +1,326 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import pytz
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from spaces.models import Space
+from swingtime.models import Event, EventType, Occurrence
+
+from .archive import archive_events
+from .forms import OccurrenceFormSet
+from .models import AuthorRollup, CalendarEvent, CalendarRollup
+from .models import ReminderPreference, SentReminder, SpacesCalendar
+from .reminders import due_reminders, send_reminders
+from .rollups import event_months, rebuild_rollups, refresh_rollups
+
+
+class CalendarTestMixin(object):
+    """
+    A space with a calendar, an author and an event type.
+    """
+
+    def setUp(self):
+        super(CalendarTestMixin, self).setUp()
+        self.user = get_user_model().objects.create_user('author', 'author@example.com', 'secret')
+        self.space = Space.objects.create(name='Test space', slug='test-space')
+        self.calendar, created = SpacesCalendar.objects.get_or_create(space=self.space)
+        self.event_type = EventType.objects.create(abbr='mtg', label='Meeting')
+
+    def create_event(self, *times, **kwargs):
+        """
+        Creates a calendar event with one occurrence per (start, end) tuple.
+        """
+        event = Event.objects.create(
+            title=kwargs.get('title', 'Event'),
+            description='',
+            event_type=kwargs.get('event_type', self.event_type)
+        )
+        CalendarEvent.objects.create(
+            event=event,
+            calendar=kwargs.get('calendar', self.calendar),
+            author=kwargs.get('author', self.user)
+        )
+        for start_time, end_time in times:
+            Occurrence.objects.create(event=event, start_time=start_time, end_time=end_time)
+        return event
+
+
+class ReminderTest(CalendarTestMixin, TestCase):
+
+    def setUp(self):
+        super(ReminderTest, self).setUp()
+        self.now = timezone.now()
+        self.event = self.create_event(
+            (self.now + timedelta(minutes=30), self.now + timedelta(minutes=90))
+        )
+        self.occurrence = self.event.occurrence_set.get()
+        ReminderPreference.objects.create(user=self.user, calendar=self.calendar, minutes_before=60)
+        patcher = mock.patch('spaces_calendar.reminders.has_space_access', return_value=True)
+        self.has_space_access = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('pinax.notifications.models.send')
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_due_reminder(self):
+        due = due_reminders(self.now)
+        self.assertEqual(
+            due,
+            [(self.occurrence.pk, self.event.pk, self.occurrence.start_time, [self.user.pk])]
+        )
+
+    def test_not_due_before_lead_time(self):
+        self.assertEqual(due_reminders(self.now - timedelta(minutes=31)), [])
+
+    def test_sent_once(self):
+        self.assertEqual(send_reminders(due_reminders(self.now)), 1)
+        self.assertEqual(self.send.call_count, 1)
+        self.assertEqual(self.send.call_args[0][0], [self.user])
+        self.assertEqual(due_reminders(self.now), [])
+
+    def test_overlapping_runs(self):
+        # both runs scanned before either of them sent anything
+        first = due_reminders(self.now)
+        second = due_reminders(self.now)
+        self.assertEqual(send_reminders(first), 1)
+        self.assertEqual(send_reminders(second), 0)
+        self.assertEqual(self.send.call_count, 1)
+        self.assertEqual(SentReminder.objects.count(), 1)
+
+    def test_former_member(self):
+        self.has_space_access.return_value = False
+        self.assertEqual(due_reminders(self.now), [])
+
+    def test_membership_checked_once_per_user_and_space(self):
+        self.create_event((self.now + timedelta(minutes=40), self.now + timedelta(minutes=50)))
+        self.assertEqual(len(due_reminders(self.now)), 2)
+        self.assertEqual(self.has_space_access.call_count, 1)
+
+    def test_calendar_without_preferences(self):
+        other_space = Space.objects.create(name='Other space', slug='other-space')
+        other_calendar, created = SpacesCalendar.objects.get_or_create(space=other_space)
+        self.create_event(
+            (self.now + timedelta(minutes=10), self.now + timedelta(minutes=20)),
+            calendar=other_calendar
+        )
+        self.assertEqual(
+            [reminder[0] for reminder in due_reminders(self.now)],
+            [self.occurrence.pk]
+        )
+
+
+class OccurrenceFormSetTest(CalendarTestMixin, TestCase):
+
+    def setUp(self):
+        super(OccurrenceFormSetTest, self).setUp()
+        self.event = self.create_event(*[
+            (self.local(day, 10), self.local(day, 12)) for day in (1, 2, 3)
+        ])
+
+    def local(self, day, hour):
+        return timezone.make_aware(datetime(2030, 1, day, hour), timezone.get_current_timezone())
+
+    def occurrences(self):
+        return self.event.occurrence_set.order_by('start_time', 'end_time')
+
+    def formset(self, changes):
+        """
+        A bound formset submitting all occurrences unchanged, except for the
+        fields given per form index in ``changes``.
+        """
+        occurrences = self.occurrences()
+        data = {
+            'occurrences-TOTAL_FORMS': str(len(occurrences)),
+            'occurrences-INITIAL_FORMS': str(len(occurrences)),
+            'occurrences-MIN_NUM_FORMS': '0',
+            'occurrences-MAX_NUM_FORMS': '1000',
+        }
+        for i, occurrence in enumerate(occurrences):
+            fields = {
+                'id': str(occurrence.pk),
+                'start_time': timezone.localtime(occurrence.start_time).strftime('%Y-%m-%d %H:%M'),
+                'end_time': timezone.localtime(occurrence.end_time).strftime('%Y-%m-%d %H:%M'),
+            }
+            fields.update(changes.get(i, {}))
+            for name, value in fields.items():
+                data['occurrences-%d-%s' % (i, name)] = value
+        return OccurrenceFormSet(data, queryset=self.occurrences(), prefix='occurrences')
+
+    def start_times(self):
+        return [o.start_time for o in self.occurrences()]
+
+    def test_shift_middle_and_following(self):
+        formset = self.formset({1: {
+            'start_time': '2030-01-02 11:00',
+            'end_time': '2030-01-02 13:00',
+            'following': 'on',
+        }})
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(
+            self.start_times(),
+            [self.local(1, 10), self.local(2, 11), self.local(3, 11)]
+        )
+        self.assertEqual(self.occurrences()[2].end_time, self.local(3, 13))
+
+    def test_shift_without_following(self):
+        formset = self.formset({1: {
+            'start_time': '2030-01-02 11:00',
+            'end_time': '2030-01-02 13:00',
+        }})
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(
+            self.start_times(),
+            [self.local(1, 10), self.local(2, 11), self.local(3, 10)]
+        )
+
+    def test_delete_middle_and_shift_following(self):
+        formset = self.formset({
+            0: {
+                'start_time': '2030-01-01 09:00',
+                'end_time': '2030-01-01 11:00',
+                'following': 'on',
+            },
+            1: {'DELETE': 'on'},
+        })
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(self.start_times(), [self.local(1, 9), self.local(3, 9)])
+
+    def test_edited_following_occurrence_is_not_shifted(self):
+        formset = self.formset({
+            0: {
+                'start_time': '2030-01-01 11:00',
+                'end_time': '2030-01-01 13:00',
+                'following': 'on',
+            },
+            2: {
+                'start_time': '2030-01-03 15:00',
+                'end_time': '2030-01-03 16:00',
+            },
+        })
+        self.assertTrue(formset.is_valid(), formset.errors)
+        formset.save()
+        self.assertEqual(
+            self.start_times(),
+            [self.local(1, 11), self.local(2, 11), self.local(3, 15)]
+        )
+
+    def test_at_least_one_occurrence(self):
+        formset = self.formset(dict((i, {'DELETE': 'on'}) for i in range(3)))
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(
+            formset.non_form_errors(),
+            ['An event needs at least one occurrence.']
+        )
+        self.assertEqual(self.occurrences().count(), 3)
+
+    def test_foreign_occurrence_id(self):
+        other = self.create_event((self.local(5, 10), self.local(5, 12)))
+        formset = self.formset({0: {'id': str(other.occurrence_set.get().pk)}})
+        self.assertFalse(formset.is_valid())
+
+
+@override_settings(TIME_ZONE='Europe/Berlin')
+class RollupTest(CalendarTestMixin, TestCase):
+    """
+    Every write refreshes the rollups of the months it touched, the way the
+    views do. Afterwards they have to equal a full rebuild.
+    """
+
+    def setUp(self):
+        super(RollupTest, self).setUp()
+        self.other_type = EventType.objects.create(abbr='wks', label='Workshop')
+        self.other_user = get_user_model().objects.create_user('other', 'other@example.com', 'secret')
+        self.event = self.add(
+            (self.local(1, 30, 10), self.local(1, 30, 12)),
+            (self.local(2, 2, 10), self.local(2, 2, 11)),
+        )
+        self.add((self.local(2, 10, 9), self.local(2, 10, 17)), author=self.other_user)
+
+    def local(self, month, day, hour):
+        return timezone.make_aware(datetime(2030, month, day, hour), pytz.timezone('Europe/Berlin'))
+
+    def add(self, *times, **kwargs):
+        event = self.create_event(*times, **kwargs)
+        refresh_rollups(event_months([event.pk]))
+        return event
+
+    def rollups(self):
+        return (
+            sorted(CalendarRollup.objects.values_list(
+                'calendar_id', 'month', 'event_type_id',
+                'event_count', 'occurrence_count', 'minutes_booked'
+            )),
+            sorted(AuthorRollup.objects.values_list(
+                'calendar_id', 'month', 'author_id', 'event_count'
+            )),
+        )
+
+    def assertRollupsRebuilt(self):
+        refreshed = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(refreshed, self.rollups())
+
+    def test_add(self):
+        rollups, author_rollups = self.rollups()
+        self.assertEqual(
+            [(r[1].month, r[3], r[4], r[5]) for r in rollups],
+            [(1, 1, 1, 120), (2, 2, 2, 60 + 8*60)]
+        )
+        self.assertRollupsRebuilt()
+
+    def test_edit(self):
+        months = event_months([self.event.pk])
+        occurrence = self.event.occurrence_set.order_by('start_time')[0]
+        occurrence.start_time = self.local(3, 5, 10)
+        occurrence.end_time = self.local(3, 5, 14)
+        occurrence.save()
+        refresh_rollups(months | event_months([self.event.pk]))
+        self.assertFalse(CalendarRollup.objects.filter(month__month=1).exists())
+        self.assertRollupsRebuilt()
+
+    def test_shift(self):
+        months = event_months([self.event.pk])
+        Occurrence.objects.filter(event=self.event).update(
+            start_time=F('start_time') + timedelta(days=40),
+            end_time=F('end_time') + timedelta(days=40)
+        )
+        refresh_rollups(months | event_months([self.event.pk]))
+        self.assertRollupsRebuilt()
+
+    def test_retype(self):
+        months = event_months([self.event.pk])
+        Event.objects.filter(pk=self.event.pk).update(event_type=self.other_type)
+        refresh_rollups(months | event_months([self.event.pk]))
+        self.assertTrue(CalendarRollup.objects.filter(event_type=self.other_type).exists())
+        self.assertRollupsRebuilt()
+
+    def test_delete(self):
+        months = event_months([self.event.pk])
+        self.event.delete()
+        refresh_rollups(months)
+        self.assertFalse(AuthorRollup.objects.filter(author=self.user).exists())
+        self.assertRollupsRebuilt()
+
+    def test_archived_occurrences_are_counted(self):
+        before = self.rollups()
+        archive_events([self.event.pk])
+        rebuild_rollups()
+        self.assertEqual(before, self.rollups())
+
+    def test_months_in_settings_time_zone(self):
+        # 00:30 on February 1st in Berlin is still January in New York
+        with timezone.override('America/New_York'):
+            self.add((self.local(2, 1, 0) + timedelta(minutes=30), self.local(2, 1, 2)))
+        self.assertEqual(
+            CalendarRollup.objects.get(month__month=2).occurrence_count,
+            3
+        )
+        self.assertRollupsRebuilt()
@@ -24,12 +24,57 @@ urlpatterns = (
         name='quarterly_view'
     ),
 
+    url(r'^calendar/(\d{4})/Q([1-4])/prefetch/$', 
+        views.prefetch_quarter, 
+        name='prefetch_quarter'
+    ),
+
     url(
         r'^calendar/(\d{4})/(0?[1-9]|1[012])/([0-3]?\d)/$', 
         views.day_view, 
         name='daily_view'
     ),
 
+    url(
+        r'^calendar/public/(?P<token>[\w-]+)/$', 
+        views.public_month_view, 
+        name='public_month'
+    ),
+
+    url(
+        r'^calendar/public/(?P<token>[\w-]+)/json/$', 
+        views.public_month_view, 
+        {'fmt': 'json'},
+        name='public_month_json'
+    ),
+
+    url(
+        r'^calendar/public/(?P<token>[\w-]+)/(?P<year>\d{4})/(?P<month>0?[1-9]|1[012])/$', 
+        views.public_month_view, 
+        name='public_month'
+    ),
+
+    url(
+        r'^calendar/public/(?P<token>[\w-]+)/(?P<year>\d{4})/(?P<month>0?[1-9]|1[012])/json/$', 
+        views.public_month_view, 
+        {'fmt': 'json'},
+        name='public_month_json'
+    ),
+
+    url(r'^calendar/stats/$', views.stats_view, name='stats'),
+
+    url(
+        r'^calendar/stats/(?P<year>\d{4})/$', 
+        views.stats_view, 
+        name='yearly_stats'
+    ),
+
+    url(
+        r'^calendar/reminders/$', 
+        views.reminder_settings, 
+        name='reminder_settings'
+    ),
+
     url(
         r'^calendar/events/add/$', 
         views.add_event, 
@@ -48,6 +93,12 @@ urlpatterns = (
         name='event'
     ),
 
+    url(
+        r'^calendar/events/bulk/$', 
+        views.bulk_edit_events, 
+        name='bulk_edit_events'
+    ),
+
     url(
         r'^calendar/events/delete/(?P<pk>\d+)/$', 
         views.DeleteEvent.as_view(), 
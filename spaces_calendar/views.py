@@ -1,20 +1,28 @@
 from datetime import datetime, date, timedelta
 from dateutil import parser
 import calendar
+import hashlib
 import itertools
+import logging
 from math import ceil
 import pytz
 
 from django import http
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Min, Q, Sum
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
-from django.utils import timezone
+from django.utils import timezone, translation
 from django.utils.translation import ugettext as _
+from django.views.decorators.cache import cache_control
+from django.views.decorators.clickjacking import xframe_options_exempt
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from django.views.generic.edit import DeleteView
 
 from actstream.signals import action as actstream_action
@@ -24,18 +32,23 @@ from swingtime.views import event_view  as st_event_view
 from swingtime.views import occurrence_view  as st_occurrence_view
 from swingtime.views import _datetime_view  as st_datetime_view
 from swingtime.views import month_view as st_month_view
-from swingtime.views import year_view as st_year_view
 from swingtime import forms as st_forms
 
 from collab.decorators import permission_required_or_403
-from collab.util import is_owner_or_admin
+from collab.util import is_admin_or_manager, is_owner_or_admin
 from spaces.models import SpacePluginRegistry
 from spaces_notifications.forms import NotificationFormSet
 from spaces_notifications.mixins import process_n12n_formset
-from .decorators import event_owner_or_admin_required
-from .models import SpacesCalendar, CalendarEvent, CalendarPlugin
+from .cache import calendar_cache, events_version, get_event_types, quarter_cache_key
+from .decorators import event_owner_or_admin_required, calendar_condition
+from .models import SpacesCalendar, CalendarEvent, CalendarPlugin, ArchivedOccurrence
+from .models import ReminderPreference, CalendarRollup, AuthorRollup
+from .occurrences import occurrence_items
+from .rollups import event_months, month_of, refresh_rollups
 from . import forms
 
+QUARTER_MONTHS = ([1,2,3], [4,5,6], [7,8,9], [10,11,12])
+
 def base_context(context = {}):
     """
         Prefill the calendar context with common values
@@ -45,6 +58,7 @@ def base_context(context = {}):
     return context
 
 @permission_required_or_403('access_space')
+@calendar_condition
 def index(request):
     '''
     Default calendar view. Should be a simple forward.
@@ -84,14 +98,17 @@ def add_event(
         recurrence_form = recurrence_form_class(request.POST)
         n12n_formset = NotificationFormSet(request.SPACE, request.POST)
         if event_form.is_valid() and recurrence_form.is_valid():
-            event = event_form.save()
             cal = SpacesCalendar.objects.get(space=request.SPACE)
-            recurrence_form.save(event)
-            calendar_event = CalendarEvent.objects.create(
-                event=event, 
-                calendar=cal,
-                author=request.user
-            )
+            # all or nothing, no orphaned events if anything fails midway
+            with transaction.atomic():
+                event = event_form.save()
+                recurrence_form.save(event)
+                calendar_event = CalendarEvent.objects.create(
+                    event=event, 
+                    calendar=cal,
+                    author=request.user
+                )
+                refresh_rollups(event_months([event.pk]))
             actstream_action.send(
                 sender=request.user, 
                 verb=_("was created"),
@@ -139,40 +156,60 @@ def event_view(
     pk,
     template='spaces_calendar/event_detail.html',
     event_form_class=forms.EventForm,
-    recurrence_form_class=forms.SingleOccurrenceForm
+    occurrence_formset_class=forms.OccurrenceFormSet
 ):
     '''
-    View an ``Event`` instance and optionally update either the event or its
-    occurrences.
+    View an ``Event`` instance and optionally update the event and all of
+    its occurrences.
     Context parameters:
     ``event``
         the event keyed by ``pk``
-        
+
+    ``occurrences``
+        all occurrences of the event, ordered by start time
+
     ``event_form``
         a form object for updating the event
-        
-    ``recurrence_form``
-        a form object for adding occurrences
+
+    ``occurrence_formset``
+        a formset for updating or deleting the occurrences, optionally
+        shifting all following occurrences as well
 
     This is mostly identical to the swingtime original. We just added activity streams on
-    instance creation/updates.
+    instance creation/updates. The occurrences are loaded once and shared
+    between the page and the formset, independent of their number.
     '''
-    event = get_object_or_404(Event, pk=pk)
-    time_format = '%Y-%m-%d %H:%M'
-    # why do I have to do astimezone()? In other places django sorts it out by itself...
-    tzinfo = timezone.get_current_timezone()
-    start_time  = event.occurrence_set.first().start_time.astimezone(tzinfo).strftime(time_format)
-    end_time    = event.occurrence_set.first().end_time.astimezone(tzinfo).strftime(time_format)
+    def ordered_occurrences(event):
+        occurrences = event.occurrence_set.order_by('start_time', 'end_time')
+        # evaluate once, the formset reuses the result cache
+        list(occurrences)
+        return occurrences
+
     if request.method == 'POST':
-        if not is_owner_or_admin(request.user, event.calendarevent.author, request.SPACE):
-            raise PermissionDenied
-        event_form = event_form_class(request.POST, instance=event)
-        recurrence_form = recurrence_form_class(request.POST, initial={'start_time':start_time, 'end_time':end_time})
         n12n_formset = NotificationFormSet(request.SPACE, request.POST)
-        if event_form.is_valid():
-            event = event_form.save()
-            if recurrence_form.is_valid():
-                recurrence_form.save(event)
+        with transaction.atomic():
+            # lock the event row, concurrent edits of the same event get
+            # serialized instead of interleaving their note and occurrence
+            # replacements.
+            event = get_object_or_404(Event.objects.select_for_update(), pk=pk)
+            if not is_owner_or_admin(request.user, event.calendarevent.author, request.SPACE):
+                raise PermissionDenied
+            occurrences = ordered_occurrences(event)
+            event_form = event_form_class(request.POST, instance=event)
+            occurrence_formset = occurrence_formset_class(
+                request.POST,
+                queryset=occurrences,
+                prefix='occurrences'
+            )
+            updated = event_form.is_valid() and occurrence_formset.is_valid()
+            if updated:
+                calendar_id = event.calendarevent.calendar_id
+                months = set((calendar_id, month_of(o.start_time)) for o in occurrences)
+                event = event_form.save()
+                occurrence_formset.save()
+                event.calendarevent.save(update_fields=['modified'])
+                refresh_rollups(months | event_months([event.pk]))
+        if updated:
             actstream_action.send(
                 sender=request.user, 
                 verb=_("was updated"), 
@@ -189,14 +226,23 @@ def event_view(
             )
             return http.HttpResponseRedirect(request.path)
     else:
+        event = get_object_or_404(
+            Event.objects.select_related('calendarevent__author', 'event_type'),
+            pk=pk
+        )
+        occurrences = ordered_occurrences(event)
         event_form = event_form_class(instance=event)
-        recurrence_form = recurrence_form_class(initial={'start_time':start_time, 'end_time':end_time})
+        occurrence_formset = occurrence_formset_class(
+            queryset=occurrences,
+            prefix='occurrences'
+        )
         n12n_formset = NotificationFormSet(request.SPACE)
 
     data = {
         'event': event,
+        'occurrences': occurrences,
         'event_form': event_form,
-        'recurrence_form': recurrence_form,
+        'occurrence_formset': occurrence_formset,
         'notification_formset': n12n_formset
     }
     return render(request, template, data)
@@ -212,7 +258,15 @@ def occurrence_view(
     '''
     This view just forwards to swingtime.views.occurence_view.
     '''
-    return st_occurrence_view(request, event_pk, pk, template, form_class)
+    if request.method == 'POST':
+        months = event_months([event_pk])
+    response = st_occurrence_view(request, event_pk, pk, template, form_class)
+    if request.method == 'POST':
+        CalendarEvent.objects\
+            .filter(event__pk=event_pk, calendar__space=request.SPACE)\
+            .update(modified=timezone.now())
+        refresh_rollups(months | event_months([event_pk]))
+    return response
 
 @permission_required_or_403('access_space')
 def day_view(
@@ -300,6 +354,7 @@ def occurrences_by_day_of_month(occurrences, start_day, end_day, month):
     return by_day
 
 @permission_required_or_403('access_space')
+@calendar_condition
 def month_view(
     request, 
     year, 
@@ -334,26 +389,32 @@ def month_view(
     
     '''
     year, month = int(year), int(month)
-    cal         = calendar.monthcalendar(year, month)
-    dtstart     = datetime(year, month, 1)
-    last_day    = max(cal[-1])
-    dtend       = datetime(year, month, last_day)
-
-
     if queryset == None:
-        space_cal   = SpacesCalendar.objects.get(space=request.SPACE)
-        queryset = Occurrence.objects\
-                        .select_related()\
-                        .filter(event__calendarevent__calendar = space_cal)
+        queryset = space_occurrences(request.SPACE)
     else:
-        queryset._clone()
+        queryset = queryset._clone()
 
-    occurrences = queryset.filter(
-        Q(start_time__year=year, start_time__month=month) |
-        Q(end_time__year=year, end_time__month=month)
-    )
+    occurrences = occurrence_items(queryset.filter(month_filter(year, month)))
+    return render(request, template, month_context(year, month, occurrences))
+
+def space_occurrences(space):
+    """
+    All Occurrences of the calendar of the given space.
+    """
+    return Occurrence.objects.filter(event__calendarevent__calendar__space=space)
 
+def month_filter(year, month):
+    """
+    Q object for occurrences starting or ending in the given month.
+    """
+    return Q(start_time__year=year, start_time__month=month) | \
+           Q(end_time__year=year, end_time__month=month)
 
+def month_grid(year, month, occurrences):
+    """
+    Builds the grid of a month from its occurrences: a list of weeks, each
+    week a list of (day, occurrences grouped by kind) tuples.
+    """
     def start_day(o):
         return o.start_time.day
 
@@ -361,18 +422,58 @@ def month_view(
         return o.end_time.day
 
     by_day = occurrences_by_day_of_month(occurrences, start_day, end_day, month)
+    return [[(d, by_day.get(d, [])) for d in row] for row in calendar.monthcalendar(year, month)]
 
-    context = {
+def month_context(year, month, occurrences):
+    """
+    Template context of month_view for the given occurrences of the month.
+    """
+    dtstart     = datetime(year, month, 1)
+    last_day    = calendar.monthrange(year, month)[1]
+    return {
         'today':      timezone.now(),
-        'calendar':   [[(d, by_day.get(d, [])) for d in row] for row in cal],
+        'calendar':   month_grid(year, month, occurrences),
         'this_month': dtstart,
         'next_month': dtstart + timedelta(days=+last_day),
         'last_month': dtstart + timedelta(days=-1),
         'day_names':  day_names_for_month(year, month),
     }
-    return render(request, template, context)
+
+def compute_quarter_calendars(year, months, queryset):
+    """
+    Builds the month grids of a quarter, see month_grid.
+    """
+    # bug: this will not display events starting in the month before and ending in the month after. OTOH that's hardly an 'event' anymore...
+    return [
+        month_grid(year, month, occurrence_items(queryset.filter(month_filter(year, month))))
+        for month in months
+    ]
+
+def store_quarter_calendars(key, calendars):
+    calendar_cache().set(
+        key,
+        calendars,
+        getattr(settings, 'SPACES_CALENDAR_QUARTER_CACHE_TIMEOUT', 60*60)
+    )
+
+def quarter_calendars(request, year, quarter, queryset=None):
+    """
+    Month grids of a quarter as built by compute_quarter_calendars. Grids of
+    the space's own calendar are kept in the calendar cache under a key that
+    includes the calendar version, so every change invalidates them.
+    """
+    months = QUARTER_MONTHS[quarter-1]
+    if queryset is not None:
+        return compute_quarter_calendars(year, months, queryset._clone())
+    key = quarter_cache_key(request, year, quarter)
+    calendars = calendar_cache().get(key)
+    if calendars is None:
+        calendars = compute_quarter_calendars(year, months, space_occurrences(request.SPACE))
+        store_quarter_calendars(key, calendars)
+    return calendars
 
 @permission_required_or_403('access_space')
+@calendar_condition
 def quarterly_view(
     request,
     year,
@@ -385,46 +486,14 @@ def quarterly_view(
     once.
     """
     year, quarter   = int(year), int(quarter)
-    months          = [[1,2,3], [4,5,6], [7,8,9], [10,11,12]][quarter-1]
-    cals            = [calendar.monthcalendar(year, month) for month in months]
-    dtstart         = datetime(year, months[0], 1)
-    last_day        = max(cals[-1][-1])
-    dtend           = datetime(year, months[-1], last_day)
-
-
-    # FIXME: queryset is the same as in monthly_view -> not DRY
-    if queryset == None:
-        space_cal   = SpacesCalendar.objects.get(space=request.SPACE)
-        queryset = Occurrence.objects\
-                        .select_related()\
-                        .filter(event__calendarevent__calendar = space_cal)
-    else:
-        queryset._clone()
-
-    occurrences = {}
-    for month in months: # bug: this will not display events starting in the month before and ending in the month after. OTOH that's hardly an 'event' anymore...
-        occurrences[month] = queryset.filter(
-            Q(start_time__year=year, start_time__month=month) |
-            Q(end_time__year=year, end_time__month=month)
-        )
-
-    def start_day(o):
-        return o.start_time.day
-
-    def end_day(o):
-        return o.end_time.day
-
-    by_day = {}
-    for month in months:
-        #by_day[month] = dict([(dt, list(o)) for dt,o in itertools.groupby(occurrences[month], start_day)])
-        by_day[month] = occurrences_by_day_of_month(occurrences[month], start_day, end_day, month)
-
-    calendars = []
-    month_idx = 0
-    for month in months:
-        calendars.append([[(d, by_day[month].get(d, [])) for d in row] for row in cals[month_idx]])
-        month_idx += 1
+    calendars       = quarter_calendars(request, year, quarter, queryset)
+    return render(request, template, quarter_context(year, quarter, calendars))
 
+def quarter_context(year, quarter, calendars):
+    """
+    Template context of quarterly_view for the given month grids.
+    """
+    months = QUARTER_MONTHS[quarter-1]
     this_quarter = {
         'quarter'   : quarter,
         'year'      : year,
@@ -447,21 +516,76 @@ def quarterly_view(
         'last_quarter': last_quarter,
         'quarterly_day_names':  day_names_for_quarter(year, months),
     }
-    context = base_context(context)
+    return base_context(context)
 
-    return render(request, template, context)
+@permission_required_or_403('access_space')
+def prefetch_quarter(request, year, quarter):
+    """
+    Computes the grids of the given quarter into the calendar cache. Called
+    by the quarterly view for the adjacent quarters while the browser is idle,
+    so that navigating forward and back hits a warm cache.
+    """
+    quarter_calendars(request, int(year), int(quarter))
+    return http.HttpResponse(status=204)
 
 @permission_required_or_403('access_space')
 def year_view(
     request,
     year,
-    template='swingtime/yearly_view.html',
-    queryset=None
+    template='spaces_calendar/yearly_view.html'
 ):
     '''
-    This view just forwards to swingtime.views.year_view.
+    List all occurrences of a year, grouped by month. Unlike the other
+    calendar views this one includes archived events.
+
+    Context parameters:
+
+    ``year``
+        the year as integer
+
+    ``by_month``
+        a list of (datetime.datetime, occurrences) tuples, one per month with
+        occurrences. Occurrences are OccurrenceItems, archived ones have
+        ``archived`` set.
+
+    ``next_year``, ``last_year``
+        year + 1 and year - 1
     '''
-    return st_year_view(request, year, month, template, queryset)
+    year = int(year)
+    occurrences = occurrence_items(
+        space_occurrences(request.SPACE).filter(year_filter(year))
+    )
+    occurrences += occurrence_items(
+        ArchivedOccurrence.objects
+            .filter(event__calendar__space=request.SPACE)
+            .filter(year_filter(year)),
+        archived=True
+    )
+    return render(request, template, year_context(year, occurrences))
+
+def year_filter(year):
+    return Q(start_time__year=year) | Q(end_time__year=year)
+
+def year_context(year, occurrences):
+    """
+    Template context of year_view for the given occurrences of the year.
+    """
+    occurrences = sorted(occurrences, key=lambda o: (o.start_time, o.end_time))
+
+    def group_month(o):
+        return o.start_time.month if o.start_time.year == year else o.end_time.month
+
+    by_month = {}
+    for o in occurrences:
+        by_month.setdefault(group_month(o), []).append(o)
+
+    context = {
+        'year':      year,
+        'by_month':  [(datetime(year, month, 1), by_month[month]) for month in sorted(by_month)],
+        'next_year': year + 1,
+        'last_year': year - 1,
+    }
+    return base_context(context)
 
 class DeleteEvent(DeleteView):
 
@@ -473,7 +597,11 @@ class DeleteEvent(DeleteView):
     @method_decorator(permission_required_or_403('access_space'))
     def delete(self, request, *args, **kwargs):
         messages.success(request, self.success_message)
-        return super(DeleteEvent, self).delete(request, *args, **kwargs)
+        with transaction.atomic():
+            months = event_months([kwargs['pk']])
+            response = super(DeleteEvent, self).delete(request, *args, **kwargs)
+            refresh_rollups(months)
+        return response
 
 
     # ensure only events of own space can get deleted
@@ -481,3 +609,371 @@ class DeleteEvent(DeleteView):
         qs = super(DeleteEvent, self).get_queryset()
         qs = qs.filter(calendarevent__calendar__space=self.request.SPACE)
         return qs
+
+
+@permission_required_or_403('access_space')
+def bulk_edit_events(
+    request,
+    template='spaces_calendar/bulk_edit.html',
+    form_class=forms.BulkEventForm
+):
+    '''
+    Delete, shift or change the event type of several events of the current
+    space at once.
+
+    The selected events are locked, resolved and checked for ownership and
+    then written with set-based updates/deletes, all inside one
+    transaction. Only one summarizing activity stream entry is created.
+
+    Context parameters:
+
+    ``calendar_events``
+        all CalendarEvents of the space, annotated with ``first_start``
+
+    ``form``
+        the bulk action form
+    '''
+    if request.method == 'POST':
+        form = form_class(request.POST)
+        if form.is_valid():
+            action = form.cleaned_data['action']
+            with transaction.atomic():
+                # lock the selected events like event_view does, the
+                # ownership check and the writes see the same rows.
+                list(
+                    Event.objects
+                        .select_for_update()
+                        .filter(pk__in=form.cleaned_data['events'])
+                        .order_by('pk')
+                        .values_list('pk', flat=True)
+                )
+                selection = list(
+                    CalendarEvent.objects
+                        .filter(
+                            calendar__space=request.SPACE,
+                            event__pk__in=form.cleaned_data['events']
+                        )
+                        .select_related('author')
+                )
+                # being the author of every selected event is sufficient,
+                # otherwise the user has to be admin/manager of the space.
+                # That is the same for every foreign author, so one check
+                # covers the whole selection.
+                foreign = [ce for ce in selection if ce.author_id != request.user.pk]
+                if foreign and not is_owner_or_admin(request.user, foreign[0].author, request.SPACE):
+                    raise PermissionDenied
+                event_pks = [ce.event_id for ce in selection]
+                months = event_months(event_pks)
+                if action == form.DELETE:
+                    Event.objects.filter(pk__in=event_pks).delete()
+                    verb = _("deleted %(count)d events")
+                    message = _('%(count)d events deleted successfully.')
+                elif action == form.SHIFT:
+                    offset = timedelta(days=form.cleaned_data['offset_days'])
+                    Occurrence.objects.filter(event__pk__in=event_pks).update(
+                        start_time=F('start_time') + offset,
+                        end_time=F('end_time') + offset
+                    )
+                    verb = _("shifted %(count)d events")
+                    message = _('%(count)d events shifted successfully.')
+                else:
+                    Event.objects.filter(pk__in=event_pks).update(
+                        event_type=form.cleaned_data['event_type']
+                    )
+                    verb = _("changed the event type of %(count)d events")
+                    message = _('Event type of %(count)d events changed successfully.')
+                if action != form.DELETE:
+                    CalendarEvent.objects\
+                        .filter(event__pk__in=event_pks)\
+                        .update(modified=timezone.now())
+                    months |= event_months(event_pks)
+                refresh_rollups(months)
+            if event_pks:
+                actstream_action.send(
+                    sender=request.user,
+                    verb=verb % {'count': len(event_pks)},
+                    target=request.SPACE
+                )
+            messages.success(request, message % {'count': len(event_pks)})
+            return redirect('spaces_calendar:index')
+    else:
+        form = form_class()
+
+    calendar_events = CalendarEvent.objects\
+                        .filter(calendar__space=request.SPACE)\
+                        .select_related('event', 'author')\
+                        .annotate(first_start=Min('event__occurrence__start_time'))\
+                        .order_by('-first_start')
+    context = {
+        'calendar_events': calendar_events,
+        'form': form,
+    }
+    context = base_context(context)
+    return render(request, template, context)
+
+
+@permission_required_or_403('access_space')
+def reminder_settings(
+    request,
+    template='spaces_calendar/reminder_settings.html',
+    form_class=forms.ReminderForm
+):
+    '''
+    Let the current user choose when to get reminded of upcoming events of
+    this space. The reminders get sent by the send_calendar_reminders
+    management command.
+    '''
+    cal = get_object_or_404(SpacesCalendar, space=request.SPACE)
+    preference = ReminderPreference.objects\
+                    .filter(user=request.user, calendar=cal)\
+                    .first()
+    if request.method == 'POST':
+        form = form_class(request.POST)
+        if form.is_valid():
+            minutes_before = form.cleaned_data['minutes_before']
+            if minutes_before is None:
+                ReminderPreference.objects\
+                    .filter(user=request.user, calendar=cal)\
+                    .delete()
+            else:
+                ReminderPreference.objects.update_or_create(
+                    user=request.user,
+                    calendar=cal,
+                    defaults={'minutes_before': minutes_before}
+                )
+            messages.success(request, _('Reminder settings saved.'))
+            return redirect('spaces_calendar:index')
+    else:
+        initial = {'minutes_before': preference.minutes_before if preference else ''}
+        form = form_class(initial=initial)
+
+    context = base_context({'form': form})
+    return render(request, template, context)
+
+
+@permission_required_or_403('access_space')
+def stats_view(
+    request,
+    year=None,
+    template='spaces_calendar/stats.html'
+):
+    '''
+    Calendar statistics for a year: events, occurrences and booked hours per
+    month and event type plus the most active authors. Reads only from the
+    precomputed rollups, never from the occurrences. Restricted to space
+    administrators and managers.
+
+    Context parameters:
+
+    ``year``, ``next_year``, ``last_year``
+        the displayed year and its neighbours
+
+    ``event_types``
+        all event types, in column order
+
+    ``rows``
+        a list of (datetime.date, cells) tuples, one per month. cells is a
+        list with one CalendarRollup (or None) per event type
+
+    ``totals``
+        per event type aggregates of the year
+
+    ``authors``
+        the ten most active authors of the year, users annotated with
+        ``event_count``
+    '''
+    if not is_admin_or_manager(request.user, request.SPACE):
+        raise PermissionDenied
+    year = int(year) if year else timezone.now().year
+    rollups = CalendarRollup.objects.filter(
+        calendar__space=request.SPACE,
+        month__year=year
+    )
+    event_types = get_event_types()
+    by_month = {}
+    for rollup in rollups:
+        by_month.setdefault(rollup.month, {})[rollup.event_type_id] = rollup
+    rows = [
+        (month, [by_month[month].get(t.pk) for t in event_types])
+        for month in sorted(by_month)
+    ]
+    totals = dict(
+        (row['event_type'], row) for row in rollups
+            .order_by()
+            .values('event_type')
+            .annotate(
+                event_count=Sum('event_count'),
+                occurrence_count=Sum('occurrence_count'),
+                minutes_booked=Sum('minutes_booked')
+            )
+    )
+    top_authors = AuthorRollup.objects\
+                    .filter(calendar__space=request.SPACE, month__year=year)\
+                    .order_by()\
+                    .values('author')\
+                    .annotate(event_count=Sum('event_count'))\
+                    .order_by('-event_count')[:10]
+    top_authors = [(row['author'], row['event_count']) for row in top_authors]
+    users = get_user_model().objects.in_bulk([author_id for author_id, count in top_authors])
+    authors = []
+    for author_id, event_count in top_authors:
+        author = users[author_id]
+        author.event_count = event_count
+        authors.append(author)
+
+    context = {
+        'year':        year,
+        'next_year':   year + 1,
+        'last_year':   year - 1,
+        'event_types': event_types,
+        'rows':        rows,
+        'totals':      [totals.get(t.pk) for t in event_types],
+        'authors':     authors,
+    }
+    context = base_context(context)
+    return render(request, template, context)
+
+
+def published_calendar(request, token):
+    """
+    The published SpacesCalendar for the given public token, memoized on the
+    request. Raises Http404 for unknown or unpublished calendars and for
+    calendars of another space than the one in the URL.
+    """
+    if not hasattr(request, '_published_calendar'):
+        request._published_calendar = get_object_or_404(
+            SpacesCalendar,
+            space=request.SPACE,
+            public_token=token,
+            is_published=True
+        )
+    return request._published_calendar
+
+def published_version(request, token):
+    if not hasattr(request, '_published_version'):
+        cal = published_calendar(request, token)
+        request._published_version = events_version(
+            CalendarEvent.objects.filter(calendar=cal)
+        )
+    return request._published_version
+
+def public_etag(request, token, year=None, month=None, fmt='html'):
+    """
+    User independent ETag for the public calendar. Without explicit year and
+    month the current month is shown, so the current date is part of it. The
+    HTML is translated, so is the language.
+
+    The public calendar has no Last-Modified validator, as deleting an event
+    does not change the latest modification time.
+    """
+    count, modified = published_version(request, token)
+    parts = [
+        token,
+        translation.get_language(),
+        year or timezone.localtime(timezone.now()).date().isoformat(),
+        month,
+        fmt,
+        count,
+        modified.isoformat() if modified else '',
+    ] + ['%s:%s' % (t.pk, t.label) for t in get_event_types()]
+    return hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+PUBLIC_MAX_AGE = getattr(settings, 'SPACES_CALENDAR_PUBLIC_MAX_AGE', 5*60)
+
+@xframe_options_exempt
+@cache_control(public=True, max_age=PUBLIC_MAX_AGE)
+@vary_on_headers('Accept-Language')
+@condition(etag_func=public_etag)
+def public_month_view(
+    request,
+    token,
+    year=None,
+    month=None,
+    fmt='html',
+    template='spaces_calendar/public_month.html'
+):
+    '''
+    Read-only month view of a published calendar, addressed by its public
+    token instead of space membership. Meant for embedding on other
+    websites: the response does not depend on the requesting user and may
+    be cached by shared caches. Renders HTML, which may be framed by any
+    site, or, with ``fmt='json'``, JSON readable from any origin.
+
+    Context parameters:
+
+    ``calendar``
+        the published SpacesCalendar
+
+    ``this_month``, ``next_month``, ``last_month``
+        datetime.date objects for the first day of these months
+
+    ``occurrences``
+        OccurrenceItems starting or ending this month, ordered by start time
+
+    ``event_types``
+        all event types
+    '''
+    cal = published_calendar(request, token)
+    year, month = public_month(year, month)
+    occurrences = occurrence_items(
+        Occurrence.objects
+            .filter(event__calendarevent__calendar=cal)
+            .filter(month_filter(year, month))
+    )
+    occurrences += occurrence_items(
+        ArchivedOccurrence.objects
+            .filter(event__calendar=cal)
+            .filter(month_filter(year, month)),
+        archived=True
+    )
+    event_types = get_event_types()
+    if fmt == 'json':
+        return public_month_json(year, month, occurrences, event_types)
+    context = public_month_context(cal, token, year, month, occurrences, event_types)
+    return render(request, template, context)
+
+def public_month(year=None, month=None):
+    """
+    Year and month to show in the public calendar, defaults to the current
+    month.
+    """
+    if year is None:
+        today = timezone.localtime(timezone.now()).date()
+        return today.year, today.month
+    return int(year), int(month)
+
+def public_month_json(year, month, occurrences, event_types):
+    occurrences = sorted(occurrences, key=lambda o: (o.start_time, o.end_time))
+    response = http.JsonResponse({
+        'year': year,
+        'month': month,
+        'event_types': [
+            {'id': t.pk, 'abbr': t.abbr, 'label': t.label}
+            for t in event_types
+        ],
+        'occurrences': [
+            {
+                'title': o.title,
+                'event_type': o.event_type_id,
+                'start_time': o.start_time.isoformat(),
+                'end_time': o.end_time.isoformat(),
+            }
+            for o in occurrences
+        ],
+    })
+    # public data, other sites may fetch it from their pages
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+def public_month_context(cal, token, year, month, occurrences, event_types):
+    this_month = date(year, month, 1)
+    last_day = calendar.monthrange(year, month)[1]
+    return {
+        'calendar':    cal,
+        'token':       token,
+        'this_month':  this_month,
+        'next_month':  this_month + timedelta(days=last_day),
+        'last_month':  this_month - timedelta(days=1),
+        'occurrences': sorted(occurrences, key=lambda o: (o.start_time, o.end_time)),
+        'event_types': event_types,
+    }